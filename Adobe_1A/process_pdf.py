@@ -1,10 +1,23 @@
 
 import os
+import sys
 import json
+import time
+import asyncio
+import argparse
+import cProfile
+import pstats
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import fitz  # PyMuPDF
-from collections import Counter, defaultdict
+from collections import Counter
 import numpy as np
 import re
+try:
+    from pdf_layout import LayoutStore, file_digest, iter_layout, open_layout
+except ImportError:  # running from a checkout: the shared module sits at the repo root
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from pdf_layout import LayoutStore, file_digest, iter_layout, open_layout
 
 HEADING_KEYWORDS = re.compile(r'^(Appendix|Chapter|Section|Summary|Background)\b', re.IGNORECASE)
 LIST_ITEM     = re.compile(r'^((\d+\.)|(\w\.)|([IVXLCDM]+\.))\s')
@@ -12,10 +25,28 @@ URL_RSVP      = re.compile(r'^(www\.|http|RSVP)', re.IGNORECASE)
 HYPHEN_LINE   = re.compile(r'^[-_\s]{3,}$')
 MAX_TEXT_LEN  = 100
 DELTA_SIZE    = 1.5 
+MAX_PENDING   = 50000  # blocks held back by stream_candidates before pruning body-sized text
+# Lighter get_text('dict') flags: skip image decoding, expand ligatures, collapse whitespace
+FAST_TEXT_FLAGS = fitz.TEXT_MEDIABOX_CLIP
+# Set to a file path to dump a cProfile/pstats profile of the run there
+PROFILE_ENV   = 'PIPELINE_PROFILE'
+MANIFEST_FILE = '.manifest.json'  # per output dir: source size/mtime/hash and options of each written JSON
+MANIFEST_VERSION = 1  # bump when the outline heuristics or output fields change
 
 
-def get_toc_outline(doc):
-    toc = doc.get_toc(simple=False)
+@contextmanager
+def timed(stats, name):
+    # Adds the block's wall time to stats[name + '_s'] when a stats dict is passed
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats[name+'_s'] = stats.get(name+'_s', 0.0) + time.perf_counter()-t0
+
+
+def get_toc_outline(toc):
+    # toc: [level, title, page] rows from pdf_layout
     if not toc:
         return None
     outline = []
@@ -27,135 +58,214 @@ def get_toc_outline(doc):
     return outline
 
 
-def extract_blocks(pdf_path):
-    doc = fitz.open(pdf_path)
-    spans = []
-    for pno, page in enumerate(doc, start=0):
-        for b in page.get_text('dict')['blocks']:
-            text = ' '.join(s['text'] for ln in b.get('lines', []) for s in ln['spans']).strip()
-            if not text or HYPHEN_LINE.match(text) or URL_RSVP.match(text):
-                continue
-            sizes = [round(s['size'],2) for ln in b.get('lines', []) for s in ln['spans']]
-            flags = [s['flags'] for ln in b.get('lines', []) for s in ln['spans']]
-            if not sizes:
-                continue
-            spans.append({
-                'text': text,
-                'page': pno,
-                'y': b['bbox'][1],
-                'x': b['bbox'][0],
-                'size': float(np.median(sizes)),
-                'is_bold': any(f & 16 for f in flags),
-                'is_italic': any(f & 2 for f in flags)
-            })
-    doc.close()
-    return spans
-
-
-def cluster_sizes(spans, k=3):
-    uniq = sorted({s['size'] for s in spans})
+def extract_blocks(doc, fast=False, page_workers=1, split_pages=None):
+    # Block table (dict of NumPy columns) for the whole document.
+    # Accepts an open document or a path; a large PDF given by path is parsed in
+    # page ranges by up to page_workers processes (see pdf_layout.ParsedLayout)
+    if isinstance(doc, str):
+        with open_layout(doc, flags=FAST_TEXT_FLAGS if fast else None,
+                         workers=page_workers, split_pages=split_pages) as layout:
+            return concat_columns([page_columns(page, pno) for pno, page in enumerate(layout.pages())])
+    return concat_columns(list(iter_page_columns(doc, fast)))
+
+
+def iter_page_columns(doc, fast=False):
+    # Yields one block table per page so callers can reduce them without materializing the document
+    for pno, layout in enumerate(iter_layout(doc, FAST_TEXT_FLAGS if fast else None)):
+        yield page_columns(layout, pno)
+
+
+def iter_blocks(doc, fast=False):
+    # Row view of iter_page_columns: one dict per block
+    for cols in iter_page_columns(doc, fast):
+        for text, pno, y, x, size, fl in zip(cols['text'].tolist(), cols['page'].tolist(), cols['y'].tolist(),
+                                             cols['x'].tolist(), cols['size'].tolist(), cols['flags'].tolist()):
+            yield {'text': text, 'page': pno, 'y': y, 'x': x, 'size': size,
+                   'is_bold': bool(fl & 16), 'is_italic': bool(fl & 2)}
+
+
+def page_columns(layout, pno):
+    # Block table of one pdf_layout page. Only the block texts are built per block in
+    # Python; the per-block median size and OR of span flags are computed for the whole
+    # page at once
+    n_spans = len(layout)
+    if not n_spans:
+        return empty_columns()
+    starts = np.flatnonzero(np.diff(layout.blocks, prepend=-1))
+    ends = np.append(starts[1:], n_spans)
+    texts = [' '.join(layout.texts[a:b]).strip() for a, b in zip(starts.tolist(), ends.tolist())]
+    keep = np.fromiter((bool(t) and not HYPHEN_LINE.match(t) and not URL_RSVP.match(t) for t in texts),
+                       dtype=bool, count=len(texts))
+    if not keep.any():
+        return empty_columns()
+    texts = [t for t, k in zip(texts, keep.tolist()) if k]
+    n = len(texts)
+    in_kept = keep[np.repeat(np.arange(len(starts)), ends - starts)]
+    counts = (ends - starts)[keep]
+    starts = np.append(0, np.cumsum(counts)[:-1])
+    block_bboxes = np.asarray(layout.block_bboxes)[keep]
+    cols = {'text': np.array(texts, dtype=object), 'page': np.full(n, pno, dtype=np.int64),
+            'y': block_bboxes[:, 1].astype(np.float64), 'x': block_bboxes[:, 0].astype(np.float64)}
+    block_id = np.repeat(np.arange(n), counts)
+    sizes = np.array([round(sz,2) for sz in layout.sizes[in_kept].tolist()], dtype=np.float64)
+    sizes = sizes[np.lexsort((sizes, block_id))]
+    # Same value as np.median per block: middle element, or mean of the two middle ones
+    cols['size'] = (sizes[starts + (counts-1)//2] + sizes[starts + counts//2]) / 2
+    cols['flags'] = np.bitwise_or.reduceat(np.asarray(layout.flags, dtype=np.int64)[in_kept], starts)
+    cols['length'] = np.fromiter(map(len, texts), dtype=np.int64, count=n)
+    cols['keyword'] = np.fromiter((bool(HEADING_KEYWORDS.match(t)) for t in texts), dtype=bool, count=n)
+    cols['list_item'] = np.fromiter((bool(LIST_ITEM.match(t)) for t in texts), dtype=bool, count=n)
+    return cols
+
+
+def take(cols, idx):
+    return {k: v[idx] for k, v in cols.items()}
+
+
+def concat_columns(tables):
+    if not tables:
+        return empty_columns()
+    if len(tables) == 1:
+        return tables[0]
+    return {k: np.concatenate([t[k] for t in tables]) for k in tables[0]}
+
+
+def empty_columns():
+    return {'text': np.zeros(0, dtype=object), 'page': np.zeros(0, dtype=np.int64), 'y': np.zeros(0),
+            'x': np.zeros(0), 'size': np.zeros(0), 'flags': np.zeros(0, dtype=np.int64),
+            'length': np.zeros(0, dtype=np.int64), 'keyword': np.zeros(0, dtype=bool),
+            'list_item': np.zeros(0, dtype=bool)}
+
+
+def size_mode(sizes):
+    # Most common size; ties go to the size seen first (as Counter.most_common does)
+    uniq, first, counts = np.unique(sizes, return_index=True, return_counts=True)
+    best = counts == counts.max()
+    return float(uniq[best][np.argmin(first[best])])
+
+
+def cluster_sizes(sizes, k=3):
+    # Splits the sorted unique sizes at the k-1 widest gaps (ties: later gap first).
+    # Returns (unique sizes, label per unique size), label 0 holding the largest sizes
+    # when there are no more than k sizes, else the smallest
+    uniq = np.unique(sizes)
     if len(uniq) <= k:
-        return {sz: idx for idx, sz in enumerate(sorted(uniq, reverse=True))}
-    diffs = [(uniq[i+1]-uniq[i], i) for i in range(len(uniq)-1)]
-    splits = sorted(diffs, reverse=True)[:k-1]
-    idxs = sorted([i for _, i in splits])
-    clusters = {}
-    start = 0; label = 0
-    for split in idxs + [len(uniq)-1]:
-        for sz in uniq[start:split+1]:
-            clusters[sz] = label
-        label += 1; start = split+1
-    return clusters
-
-
-def score_blocks(spans):
-    sizes = [s['size'] for s in spans]
-    body = Counter(sizes).most_common(1)[0][0] if sizes else 0
-    candidates = []
-    for s in spans:
-        if len(s['text']) > MAX_TEXT_LEN:
-            continue
-        score = 0
-        score += max(0, s['size'] - body) * 1.2
-        score += 1.5 if s['is_bold'] else 0
-        score += 1.0 if s['is_italic'] else 0
-        if HEADING_KEYWORDS.match(s['text']): score += 3
-        if LIST_ITEM.match(s['text']): score += 2
-        if s['y'] < 100: score += 1.5
-        if s['x'] < 50: score += 0.5
-        s['score'] = score
-        if score > 2.5:
-            candidates.append(s)
-    return candidates
+        return uniq, np.arange(len(uniq))[::-1]
+    gaps = np.diff(uniq)
+    splits = np.sort(np.lexsort((np.arange(len(gaps)), gaps))[::-1][:k-1])
+    return uniq, np.searchsorted(splits, np.arange(len(uniq)), side='left')
+
+
+def block_scores(cols, body):
+    # Terms are added in a fixed order so scores match the per-block formula bit for bit
+    score = np.maximum(0, cols['size'] - body) * 1.2
+    score = score + np.where(cols['flags'] & 16, 1.5, 0)
+    score = score + np.where(cols['flags'] & 2, 1.0, 0)
+    score = score + np.where(cols['keyword'], 3, 0)
+    score = score + np.where(cols['list_item'], 2, 0)
+    score = score + np.where(cols['y'] < 100, 1.5, 0)
+    score = score + np.where(cols['x'] < 50, 0.5, 0)
+    return score
+
+
+def score_blocks(cols):
+    body = size_mode(cols['size']) if len(cols['size']) else 0
+    short = take(cols, cols['length'] <= MAX_TEXT_LEN)
+    return take(short, block_scores(short, body) > 2.5)
+
+
+def stream_candidates(pages, max_pending=MAX_PENDING):
+    # Streaming equivalent of score_blocks(concat_columns(list(pages))): keeps a running
+    # font-size histogram and only the blocks that may still become candidates once the
+    # body size (the histogram mode) is known. Blocks scoring > 2.5 without the size term
+    # are always kept; the rest are pending. If pending grows past max_pending (checked
+    # once per page), blocks no larger than the running body size are dropped, which keeps
+    # memory bounded and is exact unless the body size later shifts below them.
+    hist = {}  # size -> [count, index of first block with that size]
+    kept = []
+    n = n_pending = 0
+    for cols in pages:
+        uniq, first, counts = np.unique(cols['size'], return_index=True, return_counts=True)
+        for sz, f, c in zip(uniq.tolist(), first.tolist(), counts.tolist()):
+            if sz in hist: hist[sz][0] += c
+            else: hist[sz] = [c, n + f]
+        n += len(cols['size'])
+        cols = take(cols, cols['length'] <= MAX_TEXT_LEN)
+        cols['sure'] = block_scores(cols, float('inf')) > 2.5
+        kept.append(cols)
+        n_pending += int((~cols['sure']).sum())
+        if n_pending > max_pending:
+            body = hist_mode(hist)
+            kept = [take(t, t['sure'] | (t['size'] > body)) for t in kept]
+            n_pending = sum(int((~t['sure']).sum()) for t in kept)
+    cands = concat_columns(kept)
+    cands.pop('sure', None)
+    body = hist_mode(hist) if hist else 0
+    return take(cands, block_scores(cands, body) > 2.5), n
+
+
+def hist_mode(hist):
+    return max(hist, key=lambda sz: (hist[sz][0], -hist[sz][1]))
 
 
 def assign_levels(cands):
-    if not cands:
+    if not len(cands['size']):
         return []
     # Compute body font to filter borderline clusters
-    sizes_all = [c['size'] for c in cands]
-    body = Counter(sizes_all).most_common(1)[0][0]
-    # Filter out spans whose size is too close to body text
-    filtered = [c for c in cands if c['size'] > body + DELTA_SIZE]
-    if not filtered:
-        filtered = cands  # fallback if no cluster survives
+    body = size_mode(cands['size'])
+    # Filter out blocks whose size is too close to body text
+    keep = cands['size'] > body + DELTA_SIZE
+    filtered = take(cands, keep) if keep.any() else cands  # fallback if no cluster survives
     # Dynamically choose up to 4 clusters for deeper hierarchies
-    max_clusters = min(4, len(set(round(c['size'],2) for c in filtered)))
-    clusters = cluster_sizes(filtered, k=max_clusters)
-    groups = defaultdict(list)
-    for c in filtered:
-        grp = clusters.get(round(c['size'],2), 0)
-        groups[grp].append(c)
-    outline = []
-    # Map each group to heading levels H1..H4
-    for grp in sorted(groups.keys()):
-        level = grp + 1
-        tag = f'H{level}'
-        for b in sorted(groups[grp], key=lambda x: (x['page'], x['y'])):
-            outline.append({'level': tag, 'text': b['text'], 'page': b['page']})
-    # remove duplicates
-    seen = set(); final = []
-    for h in outline:
-        key = (h['level'], h['text'])
-        if key in seen: continue
-        seen.add(key); final.append(h)
-    return final
-    if not cands:
-        return []
-    # Compute body font to filter borderline clusters
-    sizes = [c['size'] for c in cands]
-    body = Counter(sizes).most_common(1)[0][0]
-    # Filter out spans whose size is too close to body text
-    filtered = [c for c in cands if c['size'] > body + DELTA_SIZE]
-    if not filtered:
-        filtered = cands  # fallback if no cluster survives
-    # Cluster remaining sizes
-    clusters = cluster_sizes(filtered, k=3)
-    groups = defaultdict(list)
-    for c in filtered:
-        groups[clusters.get(round(c['size'],2),0)].append(c)
-    outline = []
-    for lvl in sorted(groups.keys()):
-        tag = f'H{lvl+1}'
-        for b in sorted(groups[lvl], key=lambda x: (x['page'], x['y'])):
-            outline.append({'level': tag, 'text': b['text'], 'page': b['page']})
+    uniq, inverse = np.unique(filtered['size'], return_inverse=True)
+    rounded = np.array([round(sz,2) for sz in uniq.tolist()])[inverse.ravel()]
+    sizes, labels = cluster_sizes(uniq, k=min(4, len(np.unique(rounded))))
+    # Clusters are keyed by exact size but looked up by rounded size; misses go to group 0
+    pos = np.minimum(np.searchsorted(sizes, rounded), len(sizes)-1)
+    groups = np.where(sizes[pos] == rounded, labels[pos], 0)
+    # Map each group to heading levels H1..H4, in page order within a group
+    order = np.lexsort((filtered['y'], filtered['page'], groups))
     seen = set(); final = []
-    for h in outline:
-        key = (h['level'], h['text'])
+    for grp, text, pno in zip(groups[order].tolist(), filtered['text'][order].tolist(),
+                              filtered['page'][order].tolist()):
+        # remove duplicates
+        key = (f'H{grp+1}', text)
         if key in seen: continue
-        seen.add(key); final.append(h)
+        seen.add(key); final.append({'level': key[0], 'text': text, 'page': pno})
     return final
 
 
-def extract_outline(pdf_path):
-    doc = fitz.open(pdf_path)
-    toc = get_toc_outline(doc)
-    doc.close()
+def extract_outline(pdf_path, fast=False, stats=None, corpus=None, page_workers=1, split_pages=None):
+    # One pdf_layout read serves both the TOC lookup and block extraction.
+    # Pass a dict as stats to collect per-stage timings and counts. With a corpus
+    # directory (a pdf_layout store, which 1B can share), the first run stores the
+    # PDF's layout there and later runs score the stored spans without opening the PDF.
+    # With page_workers > 1, pages past the first few are parsed in page ranges by that
+    # many processes once the document is long enough for it to pay off (split_pages
+    # overrides the measured threshold); blocks are still scored in page order.
+    store = LayoutStore(corpus) if corpus else None
+    with timed(stats, 'open'):
+        layout = open_layout(pdf_path, store, FAST_TEXT_FLAGS if fast else None, 'fast' if fast else '',
+                             page_workers, split_pages)
+    with layout:  # on exit, a new store entry is written (pages not read below are parsed for it)
+        n_pages = layout.page_count
+        with timed(stats, 'toc'):
+            toc = get_toc_outline(layout.toc)
+        if not toc:
+            # Blocks are scored as pages stream in, so extraction and scoring share one timer
+            with timed(stats, 'extract_score_blocks'):
+                cands, n_spans = stream_candidates(page_columns(page, pno)
+                                                   for pno, page in enumerate(layout.pages()))
+    if stats is not None:
+        stats['pages'] = n_pages
+        if getattr(layout, 'split', False): stats['split_files'] = 1  # summed into the batch counts
     if toc:
+        if stats is not None: stats['headings'] = len(toc)
         return {'title':'','outline':toc}
-    spans = extract_blocks(pdf_path)
-    cands = score_blocks(spans)
-    headings = assign_levels(cands)
+    with timed(stats, 'assign_levels'):
+        headings = assign_levels(cands)
+    if stats is not None:
+        stats.update(spans=n_spans, candidates=len(cands['size']), headings=len(headings))
     title = ''
     for h in headings:
         if h['level']=='H1' and h['page']==0:
@@ -163,12 +273,219 @@ def extract_outline(pdf_path):
     headings = [h for h in headings if h['text'] != title]
     return {'title':title,'outline':headings}
 
-if __name__=='__main__':
-    inp, outp = 'input','output'
-    os.makedirs(outp,exist_ok=True)
-    for f in os.listdir(inp):
-        if not f.lower().endswith('.pdf'): continue
-        res = extract_outline(os.path.join(inp,f))
-        with open(os.path.join(outp,f.replace('.pdf','.json')),'w',encoding='utf-8') as o:
+def fingerprint(path, digest=True):
+    st = os.stat(path)
+    fp = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if digest: fp['sha256'] = file_digest(path)
+    return fp
+
+
+def load_manifest(outp):
+    # A manifest from another MANIFEST_VERSION is ignored, so every PDF is reprocessed
+    try:
+        with open(os.path.join(outp,MANIFEST_FILE),encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('files', {})
+
+
+def save_manifest(outp, manifest):
+    path = os.path.join(outp,MANIFEST_FILE)
+    with open(path+'.tmp','w',encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': manifest},f,indent=1)
+    os.replace(path+'.tmp',path)
+
+
+def is_unchanged(entry, pdf_path, out_path, options):
+    # Same size+mtime, or same content hash after a touch/copy, written with the same
+    # options, and the output still exists
+    if not entry or entry.get('options') != options or not os.path.exists(out_path):
+        return False
+    fp = fingerprint(pdf_path, digest=False)
+    if (fp['size'], fp['mtime_ns']) == (entry['size'], entry['mtime_ns']):
+        return True
+    if fp['size'] == entry['size'] and file_digest(pdf_path) == entry['sha256']:
+        entry['mtime_ns'] = fp['mtime_ns']
+        return True
+    return False
+
+
+def parse_file(pdf_path, fast=False, corpus=None, page_workers=1, split_pages=None):
+    # Executor entry point: outline and per-stage stats for one PDF. A PDF that fails
+    # to parse comes back as (None, stats) with the error in stats, so one unreadable
+    # file does not abort the batch
+    t0 = time.perf_counter()
+    stats = {}
+    try:
+        res = extract_outline(pdf_path, fast, stats, corpus, page_workers, split_pages)
+    except Exception as e:
+        res = None
+        stats['error'] = f'{type(e).__name__}: {e}'
+    stats['parse_s'] = time.perf_counter()-t0
+    return res, stats
+
+
+def write_output(out_path, res, stats):
+    with timed(stats, 'write_json'):
+        with open(out_path,'w',encoding='utf-8') as o:
             json.dump(res,o,indent=2,ensure_ascii=False)
-        print(f'Processed {f}')
+
+
+def timed_call(fn, *args):
+    # (result, seconds), timed in the calling thread rather than by the awaiting event loop
+    t0 = time.perf_counter()
+    return fn(*args), time.perf_counter()-t0
+
+
+async def run_pipeline(jobs, workers, queue_size, on_done):
+    # read -> parse -> write with bounded queues between stages, so hashing the next
+    # PDFs (which also pulls them into the page cache), parsing in the process pool and
+    # JSON writing overlap; a full queue stalls the stage feeding it. With one worker,
+    # parsing runs in this process (so PIPELINE_PROFILE sees it).
+    # Returns {queue: [depth after each put]}.
+    loop = asyncio.get_running_loop()
+    io = ThreadPoolExecutor(2)  # one reader, one writer
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    read_q, parsed_q = asyncio.Queue(queue_size), asyncio.Queue(queue_size)
+    depth = {'read': [], 'parse': []}
+
+    async def put(q, name, item):
+        await q.put(item)
+        depth[name].append(q.qsize())
+
+    async def read():
+        for job in jobs:
+            fp, read_s = await loop.run_in_executor(io, timed_call, fingerprint, job[0])
+            await put(read_q, 'read', (job, fp, read_s))
+        for _ in range(workers):
+            await read_q.put(None)
+
+    async def parse():
+        while (item := await read_q.get()) is not None:
+            (pdf_path, out_path, *options), fp, read_s = item
+            if pool is None:
+                res, stats = parse_file(pdf_path, *options)
+            else:
+                res, stats = await loop.run_in_executor(pool, parse_file, pdf_path, *options)
+            stats['read_s'] = read_s
+            await put(parsed_q, 'parse', (pdf_path, out_path, fp, res, stats))
+
+    async def write():
+        while (item := await parsed_q.get()) is not None:
+            pdf_path, out_path, fp, res, stats = item
+            if res is not None:
+                await loop.run_in_executor(io, write_output, out_path, res, stats)
+            stats['total_s'] = stats['read_s'] + stats['parse_s'] + stats.get('write_json_s', 0.0)
+            on_done(os.path.basename(pdf_path), stats, fp)
+
+    try:
+        writer = asyncio.ensure_future(write())
+        await asyncio.gather(read(), *(parse() for _ in range(workers)))
+        await parsed_q.put(None)
+        await writer
+    finally:
+        io.shutdown()
+        if pool is not None:
+            pool.shutdown()
+    return depth
+
+
+def run_batch(inp, outp, workers=None, queue_size=None, fast=False, stats_path=None, force=False, corpus=None,
+              page_workers=None, split_pages=None):
+    os.makedirs(outp,exist_ok=True)
+    if corpus: os.makedirs(corpus,exist_ok=True)
+    out_name = lambda f: f.replace('.pdf','.json')
+    files = [f for f in os.listdir(inp) if f.lower().endswith('.pdf')]
+    # Incremental: skip unchanged PDFs, drop outputs whose PDF was deleted
+    manifest = {} if force else load_manifest(outp)
+    options = {'fast': bool(fast)}  # everything besides the PDF that changes the output
+    for f in [f for f in manifest if f not in files]:
+        try: os.remove(os.path.join(outp,out_name(f)))
+        except OSError: pass
+        del manifest[f]
+        print(f'Removed output for deleted {f}')
+    skipped = [f for f in files if is_unchanged(manifest.get(f), os.path.join(inp,f), os.path.join(outp,out_name(f)), options)]
+    files = [f for f in files if f not in skipped]
+    if skipped:
+        print(f'Skipped {len(skipped)} unchanged files')
+    # Largest-first by file size (a stat, not an extra open per PDF) so big PDFs don't end up as the tail of the run
+    sizes = {f: os.path.getsize(os.path.join(inp,f)) for f in files}
+    files.sort(key=lambda f: (-sizes[f], f))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files) or 1))
+    # Each file worker may split a long PDF across its own page-range processes; by
+    # default they share the CPUs the file workers leave over (split_threshold assumes
+    # idle cores), so a lone huge file uses every core and a full file pool never splits
+    page_workers = max(1, page_workers or (os.cpu_count() or 1)//workers)
+    jobs = [(os.path.join(inp,f), os.path.join(outp,out_name(f)), fast, corpus, page_workers, split_pages)
+            for f in files]
+    queue_size = max(1, queue_size or 2*workers)
+    per_file, failed = {}, {}
+
+    def on_done(name, stats, fp):
+        if 'error' in stats:
+            # Left out of the manifest (and any older output removed), so the next run retries it
+            failed[name] = stats.pop('error')
+            manifest.pop(name, None)
+            try: os.remove(os.path.join(outp,out_name(name)))
+            except OSError: pass
+            print(f'Failed {name}: {failed[name]}', file=sys.stderr)
+            return
+        per_file[name] = stats
+        manifest[name] = dict(fp, options=options)
+        print(f'Processed {name} ({stats["pages"]} pages, {stats["total_s"]:.2f}s)')
+
+    t0 = time.perf_counter()
+    try:
+        depth = asyncio.run(run_pipeline(jobs, workers, queue_size, on_done))
+    finally:
+        save_manifest(outp, manifest)
+    elapsed = time.perf_counter()-t0
+    total_pages = sum(stats['pages'] for stats in per_file.values())
+    rate = lambda n: n/elapsed if elapsed > 0 else 0.0
+    print(f'{len(jobs)} files, {total_pages} pages in {elapsed:.2f}s with {workers} workers: '
+          f'{rate(len(jobs)):.2f} files/s, {rate(total_pages):.2f} pages/s')
+    if failed:
+        print(f'{len(failed)} files failed: {", ".join(sorted(failed))}')
+    # Stage times are summed over files (CPU time across workers, not wall time)
+    totals = Counter()
+    for stats in per_file.values():
+        totals.update(stats)
+    if totals:
+        print('Stage totals: ' + ', '.join(f'{k[:-2]} {v:.2f}s' for k, v in totals.items() if k.endswith('_s')))
+        print('Counts: ' + ', '.join(f'{k} {v}' for k, v in totals.items() if not k.endswith('_s')))
+    # Depth of each queue after every put: near queue_size means the next stage is the bottleneck
+    queues = {name: {'max': max(d), 'mean': round(sum(d)/len(d), 2)} for name, d in depth.items() if d}
+    if queues:
+        print(f'Queue depth (capacity {queue_size}): ' +
+              ', '.join(f'{name} max {q["max"]} mean {q["mean"]}' for name, q in queues.items()))
+    if stats_path:
+        with open(stats_path,'w',encoding='utf-8') as o:
+            json.dump({'elapsed_s': elapsed, 'workers': workers, 'queue_size': queue_size, 'queue_depth': queues,
+                       'totals': dict(totals), 'files': per_file, 'failed': failed}, o, indent=2)
+
+
+if __name__=='__main__':
+    ap = argparse.ArgumentParser(description='Extract heading outlines from every PDF in a directory.')
+    ap.add_argument('--input', default='input')
+    ap.add_argument('--output', default='output')
+    ap.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count, 1 = serial)')
+    ap.add_argument('--queue-size', type=int, default=None, help='capacity of each queue between pipeline stages (default: 2 x workers)')
+    ap.add_argument('--fast-text', action='store_true', help='lighter text extraction (no images, ligature/whitespace preservation)')
+    ap.add_argument('--stats', help='write per-file stage timings and counts to this JSON file')
+    ap.add_argument('--force', action='store_true', help='reprocess every PDF, ignoring the output manifest')
+    ap.add_argument('--page-workers', type=int, default=None, help='processes that parse page ranges of one large PDF (default: CPU count / file workers, 1 = never split)')
+    ap.add_argument('--split-pages', type=int, default=None, help='split PDFs with at least this many pages left after the first few (default: decided from the measured parse rate)')
+    ap.add_argument('--corpus', help='pdf_layout store: keep each PDF\'s parsed layout here and reuse it instead of re-parsing (can be shared with 1B\'s corpus_dir)')
+    args = ap.parse_args()
+    profile_path = os.environ.get(PROFILE_ENV)
+    if profile_path:
+        # Only the parent process is profiled; use --workers 1 to include extraction
+        prof = cProfile.Profile(); prof.enable()
+    run_batch(args.input, args.output, args.workers, args.queue_size, args.fast_text, args.stats, args.force, args.corpus,
+              args.page_workers, args.split_pages)
+    if profile_path:
+        prof.disable(); prof.dump_stats(profile_path)
+        pstats.Stats(prof).sort_stats('cumulative').print_stats(25)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from process_pdf import MANIFEST_FILE, extract_outline, run_batch
+
+INPUT_DIR = Path(__file__).parent / "input"
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+# Outlines written by the original per-block implementation (before the NumPy block scoring)
+EXPECTED_DIR = FIXTURES_DIR / "expected"
+
+def outputs(output_dir):
+    return [path for path in sorted(output_dir.glob("*.json")) if path.name != MANIFEST_FILE]
+
+def run_and_mark(input_dir, output_dir, fast=False):
+    """Run the batch, then overwrite every output with a marker so a later run shows which files it rewrote."""
+    run_batch(str(input_dir), str(output_dir), workers=1, fast=fast, page_workers=1)
+    for path in outputs(output_dir):
+        path.write_text('"marker"', encoding="utf-8")
+
+def rewritten(output_dir):
+    return [path.name for path in outputs(output_dir) if path.read_text(encoding="utf-8") != '"marker"']
+
+def test_manifest_tracks_options_and_version():
+    """Unchanged PDFs are skipped only when the options and MANIFEST_VERSION they were written with still match."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir, output_dir = Path(temp_dir) / "input", Path(temp_dir) / "output"
+        input_dir.mkdir()
+        shutil.copy(INPUT_DIR / "file01.pdf", input_dir)
+
+        run_and_mark(input_dir, output_dir)
+        run_batch(str(input_dir), str(output_dir), workers=1, page_workers=1)
+        assert rewritten(output_dir) == []
+
+        run_batch(str(input_dir), str(output_dir), workers=1, fast=True, page_workers=1)
+        assert rewritten(output_dir) == ["file01.json"]
+        manifest = json.loads((output_dir / MANIFEST_FILE).read_text(encoding="utf-8"))
+        assert manifest["files"]["file01.pdf"]["options"] == {"fast": True}
+
+        run_and_mark(input_dir, output_dir, fast=True)
+        manifest["version"] = 0
+        (output_dir / MANIFEST_FILE).write_text(json.dumps(manifest), encoding="utf-8")
+        run_batch(str(input_dir), str(output_dir), workers=1, fast=True, page_workers=1)
+        assert rewritten(output_dir) == ["file01.json"]
+    print("Manifest options test passed!")
+
+def test_outlines_match_expected():
+    """Outlines of the sample PDFs match the checked-in ones, serially and with pages parsed in ranges."""
+    # layout_mix.pdf has no TOC, mixed-size spans within blocks and more than four heading sizes
+    pdf_paths = sorted(INPUT_DIR.glob("*.pdf")) + sorted(FIXTURES_DIR.glob("*.pdf"))
+    assert len(pdf_paths) == len(list(EXPECTED_DIR.glob("*.json")))
+    for pdf_path in pdf_paths:
+        expected = json.loads((EXPECTED_DIR / f"{pdf_path.stem}.json").read_text(encoding="utf-8"))
+        assert extract_outline(str(pdf_path)) == expected, pdf_path.name
+        assert extract_outline(str(pdf_path), page_workers=2, split_pages=1) == expected, pdf_path.name
+    print("Outline regression test passed!")
+
+if __name__ == "__main__":
+    print("Running Adobe Hackathon Round 1A Solution Tests\n")
+
+    try:
+        test_manifest_tracks_options_and_version()
+        test_outlines_match_expected()
+        print("\nAll tests passed!")
+    except Exception as e:
+        print(f"\nTest suite failed: {e}")
+        exit(1)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+# Ranking strategies from most to least work; the scheduler picks the first that fits
+DEGRADATION_LEVELS = (
+    "full",                 # section titles and subsection bodies embedded
+    "subsection_headings",  # subsections ranked by their embedded heading instead of their body
+    "titles_only",          # only section titles embedded; subsections ranked by BM25
+    "lexical",              # BM25 only, the model is not used
+)
+
+MAX_TEXT_UNITS = 257  # the model truncates long inputs, so their cost stops growing
+
+
+class BudgetExceeded(Exception):
+    """Raised between embedding batches once the budget's deadline has passed."""
+
+
+class BudgetScheduler:
+    """Wall-clock budget for one run, with cost estimates learned from its first items.
+
+    Parsing may use up to ``parse_share`` of the budget: documents whose estimated parse
+    time would overrun it are skipped (smallest documents go first), and documents
+    already being parsed stop at the parse deadline and keep the pages read so far.
+    Embedding ahead of ranking, which overlaps parsing, stops at the same deadline.
+    Ranking then picks the first DEGRADATION_LEVELS entry whose estimated embedding
+    cost fits the remaining time, keeping ``reserve_seconds`` for writing the output.
+    """
+
+    def __init__(self, seconds: float, parse_share: float = 0.5, reserve_seconds: float = 1.0):
+        self.seconds = float(seconds)
+        self.parse_share = parse_share
+        self.reserve_seconds = reserve_seconds
+        self.start()
+
+    def start(self):
+        """Restart the clock and forget the previous run's estimates."""
+        self.started = time.perf_counter()
+        # Wall-clock deadline, comparable across the worker processes that parse documents
+        self.parse_deadline = time.time() + self.seconds * self.parse_share
+        self.enforce = False  # when set, expired() stops embedding (see DocumentProcessor._encode_batches)
+        self.encode_deadline: Optional[float] = None  # time.time() at which embedding ahead of ranking stops
+        self.level = 0
+        self.parse_seconds = 0.0
+        self.parse_bytes = 0
+        self.encode_seconds = 0.0
+        self.encode_units = 0
+        self.skipped: List[str] = []
+        self.truncated: List[str] = []
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def remaining(self) -> float:
+        """Seconds left before the output has to be written."""
+        return self.seconds - self.reserve_seconds - self.elapsed()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def stop_encoding(self) -> bool:
+        """Whether embedding must stop: past encode_deadline, or out of time while enforced."""
+        if self.encode_deadline is not None and time.time() >= self.encode_deadline:
+            return True
+        return self.enforce and self.expired()
+
+    def observe_parse(self, size_bytes: int, seconds: float):
+        self.parse_bytes += size_bytes
+        self.parse_seconds += seconds
+
+    def admit(self, size_bytes: int) -> bool:
+        """Whether a document of this size is expected to finish parsing before the parse deadline."""
+        available = self.parse_deadline - time.time()
+        if available <= 0:
+            return False
+        if not self.parse_bytes:
+            return True  # no estimate yet: the first documents provide it
+        return size_bytes * self.parse_seconds / self.parse_bytes <= available
+
+    @staticmethod
+    def text_units(texts: Iterable[str]) -> int:
+        """Encoding cost units: whitespace tokens plus one per text, capped at the model's input length."""
+        return sum(min(len(text.split()) + 1, MAX_TEXT_UNITS) for text in texts)
+
+    def observe_encode(self, units: int, seconds: float):
+        self.encode_units += units
+        self.encode_seconds += seconds
+
+    def seconds_per_unit(self) -> Optional[float]:
+        return self.encode_seconds / self.encode_units if self.encode_units else None
+
+    def plan(self, level_units: List[int]) -> int:
+        """First level whose estimated encoding time fits the remaining budget (the last one always does)."""
+        rate = self.seconds_per_unit() or 0.0
+        remaining = self.remaining()
+        for level, units in enumerate(level_units[:-1]):
+            if units * rate <= remaining:
+                return level
+        return len(level_units) - 1
+
+    def report(self) -> Dict[str, Any]:
+        """Summary for the output metadata."""
+        rate = self.seconds_per_unit()
+        return {
+            "seconds": self.seconds,
+            "elapsed_seconds": round(self.elapsed(), 4),
+            "level": self.level,
+            "degradation": DEGRADATION_LEVELS[self.level],
+            "documents_skipped": list(self.skipped),
+            "documents_truncated": list(self.truncated),
+            "estimated_parse_seconds_per_mb": round(self.parse_seconds / self.parse_bytes * (1 << 20), 4)
+            if self.parse_bytes else None,
+            "estimated_encode_seconds_per_unit": round(rate, 6) if rate is not None else None,
+        }
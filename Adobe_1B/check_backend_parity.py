@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Compare rankings from the sentence-transformers backend and the ONNX backend.
+
+Scores every section and subsection of the PDFs in --input against the persona/job
+in config.json and each of its sample_configurations, with both backends, and reports
+top-k overlap, Spearman rank correlation and encode throughput.
+
+    python check_backend_parity.py --onnx-dir models/minilm-onnx [--model all-MiniLM-L6-v2] [--input input] [--float32]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from main import DocumentProcessor, load_config
+from embedding_backends import MODEL_NAME
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    """Spearman correlation of two score vectors (ties broken by position)."""
+    if len(a) < 2:
+        return 1.0
+    rank_a = np.argsort(np.argsort(a)).astype(np.float64)
+    rank_b = np.argsort(np.argsort(b)).astype(np.float64)
+    return float(np.corrcoef(rank_a, rank_b)[0, 1])
+
+
+def queries_from_config(config: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    queries = [("config", config.get("persona", "Research Analyst"),
+                config.get("job_to_be_done", "Analyze key findings and methodologies"))]
+    for name, sample in config.get("sample_configurations", {}).items():
+        queries.append((name, sample["persona"], sample["job_to_be_done"]))
+    return queries
+
+
+def score_all(processor: DocumentProcessor, queries: List[Tuple[str, str, str]],
+              texts: Dict[str, List[str]]) -> Tuple[Dict[Tuple[str, str], np.ndarray], float]:
+    """Scores per (query, kind) and texts encoded per second."""
+    processor.warm_up()
+    start = time.perf_counter()
+    embeddings = {kind: processor.encode_texts(items) for kind, items in texts.items()}
+    query_embeddings = processor.encode_texts([f"{persona} {job}" for _, persona, job in queries])
+    elapsed = time.perf_counter() - start
+    scores = {
+        (name, kind): embeddings[kind] @ query_embeddings[q]
+        for q, (name, _, _) in enumerate(queries)
+        for kind in texts
+    }
+    encoded = sum(len(items) for items in texts.values()) + len(queries)
+    return scores, encoded / elapsed if elapsed else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--onnx-dir", required=True, help="directory written by export_onnx.py")
+    parser.add_argument("--model", default=MODEL_NAME, help="sentence-transformers model name or local directory")
+    parser.add_argument("--input", default="input")
+    parser.add_argument("--float32", action="store_true", help="compare the unquantized model.onnx")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    config = load_config()
+    pdf_files = sorted(Path(args.input).glob("*.pdf"))
+    if not pdf_files:
+        sys.exit(f"No PDF files found in {args.input}")
+
+    reference = DocumentProcessor(workers=1, backend_options={"model_name": args.model})
+    sections, subsections = [], []
+    for document in reference.extract_documents(pdf_files):
+        sections.extend(document["sections"])
+        subsections.extend(document["subsections"])
+    texts = {"sections": [s["title"] for s in sections], "subsections": [s["text"] for s in subsections]}
+    queries = queries_from_config(config)
+
+    candidate = DocumentProcessor(workers=1, backend="onnx",
+                                  backend_options={"model_dir": args.onnx_dir, "quantized": not args.float32})
+    reference_scores, reference_rate = score_all(reference, queries, texts)
+    candidate_scores, candidate_rate = score_all(candidate, queries, texts)
+
+    print(f"{len(sections)} sections, {len(subsections)} subsections from {len(pdf_files)} PDFs, "
+          f"{len(queries)} queries")
+    print(f"{'query':<22} {'kind':<12} {'top-' + str(args.top_k) + ' overlap':>14} {'top-1':>6} {'spearman':>9}")
+    overlaps = []
+    for (name, kind), expected in reference_scores.items():
+        actual = candidate_scores[(name, kind)]
+        k = min(args.top_k, len(expected))
+        if k == 0:
+            continue
+        top_expected = np.argsort(-expected, kind="stable")[:k]
+        top_actual = np.argsort(-actual, kind="stable")[:k]
+        overlap = len(set(top_expected) & set(top_actual)) / k
+        overlaps.append(overlap)
+        print(f"{name:<22} {kind:<12} {overlap:>14.2f} {'yes' if top_expected[0] == top_actual[0] else 'no':>6} "
+              f"{spearman(expected, actual):>9.4f}")
+
+    print(f"\nmean top-{args.top_k} overlap: {np.mean(overlaps):.3f}")
+    print(f"encode throughput: {reference.model_id} {reference_rate:.0f} texts/s, "
+          f"{candidate.model_id} {candidate_rate:.0f} texts/s")
+    print(f"import: {reference.startup_timings.get('import_seconds', 0):.2f}s vs "
+          f"{candidate.startup_timings.get('import_seconds', 0):.2f}s")
+    print(f"model load: {reference.startup_timings.get('model_load_seconds', 0):.2f}s vs "
+          f"{candidate.startup_timings.get('model_load_seconds', 0):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
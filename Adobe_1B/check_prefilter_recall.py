@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Compare rankings with the BM25 prefilter against the exhaustive embedding ranking.
+
+Ranks the sections and subsections of the PDFs in --input for the persona/job in
+config.json and each of its sample_configurations, once over every text and once per
+candidate pool size, and reports top-k recall and the share of texts that were embedded.
+
+    python check_prefilter_recall.py [--input input] [--pools 50 100 200 400] [--model all-MiniLM-L6-v2]
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from main import create_processor, load_config
+from instrumentation import Instrumentation
+from check_backend_parity import queries_from_config
+
+
+def recall(expected: List[Dict[str, Any]], actual: List[Dict[str, Any]], key: str) -> float:
+    """Share of the exhaustive top-k found in the pruned top-k."""
+    if not expected:
+        return 1.0
+    wanted = {(item["document"], item["page"], item[key]) for item in expected}
+    found = {(item["document"], item["page"], item[key]) for item in actual}
+    return len(wanted & found) / len(wanted)
+
+
+def rank(processor, sections, subsections, queries: List[Tuple[str, str, str]], pool: int):
+    processor.prefilter_candidates = pool
+    processor.instrumentation = Instrumentation()
+    ranked = [processor.calculate_relevance_scores(sections, subsections, persona, job)
+              for _, persona, job in queries]
+    counts = processor.instrumentation.counters
+    return ranked, counts.get("prefilter_section_candidates", 0), counts.get("prefilter_subsection_candidates", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", default="input")
+    parser.add_argument("--pools", type=int, nargs="+", default=[50, 100, 200, 400],
+                        help="prefilter_candidates values to try")
+    parser.add_argument("--model", help="sentence-transformers model name or local directory")
+    args = parser.parse_args()
+
+    config = load_config()
+    # Exact flat scoring everywhere, so differences come from the prefilter alone
+    config.update(index_mode="flat", index_quantize=False, index_dir=None, workers=1)
+    if args.model:
+        config.update(embedding_backend="sentence-transformers", embedding_backend_options={"model_name": args.model})
+    processor = create_processor(config)
+
+    pdf_files = sorted(Path(args.input).glob("*.pdf"))
+    if not pdf_files:
+        sys.exit(f"No PDF files found in {args.input}")
+    sections, subsections = [], []
+    for document in processor.extract_documents(pdf_files):
+        sections.extend(document["sections"])
+        subsections.extend(document["subsections"])
+    queries = queries_from_config(config)
+
+    processor._prefetched = {}  # every text is embedded once, by the exhaustive run
+    exhaustive, _, _ = rank(processor, sections, subsections, queries, 0)
+    total = (len(sections) + len(subsections)) * len(queries)
+
+    print(f"{len(sections)} sections, {len(subsections)} subsections from {len(pdf_files)} PDFs, "
+          f"{len(queries)} queries, top-{processor.top_k}")
+    print(f"{'pool':>6} {'section recall':>15} {'subsection recall':>18} {'embedded':>9}")
+    for pool in args.pools:
+        pruned, section_candidates, subsection_candidates = rank(processor, sections, subsections, queries, pool)
+        section_recall = np.mean([recall(full[0], cut[0], "title") for full, cut in zip(exhaustive, pruned)])
+        subsection_recall = np.mean([recall(full[1], cut[1], "text") for full, cut in zip(exhaustive, pruned)])
+        embedded = (section_candidates + subsection_candidates) / total if total else 0.0
+        print(f"{pool:>6} {section_recall:>15.3f} {subsection_recall:>18.3f} {embedded:>9.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+
+import os
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+import numpy as np
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+
+class EmbeddingBackend(ABC):
+    """Interface behind DocumentProcessor.model: encode texts into float32 vectors.
+
+    ``model_id`` identifies the vectors a backend produces, so embedding caches and
+    persisted indexes built with one backend are never reused with another.
+    ``import_seconds`` is the part of construction spent importing the backend's
+    libraries, reported apart from loading the model itself.
+    """
+
+    model_id = MODEL_NAME
+    import_seconds = 0.0
+
+    @abstractmethod
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True) -> np.ndarray:
+        """Float32 vectors for the texts, one row per text in input order."""
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Full-precision PyTorch model via sentence-transformers."""
+
+    def __init__(self, model_name: str = MODEL_NAME):
+        start = time.perf_counter()
+        from sentence_transformers import SentenceTransformer  # pulls in torch
+        self.import_seconds = time.perf_counter() - start
+        self.model_id = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=convert_to_numpy)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime CPU backend for a model exported with export_onnx.py.
+
+    Loads ``model_quantized.onnx`` (int8 weights) or ``model.onnx`` plus ``tokenizer.json``
+    from a local directory; nothing is downloaded. Applies the same mean pooling and
+    L2 normalization as the sentence-transformers pipeline.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = True, threads: int = 0):
+        start = time.perf_counter()
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        self.import_seconds = time.perf_counter() - start
+
+        model_file = "model_quantized.onnx" if quantized else "model.onnx"
+        model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"{model_path} not found; create it with export_onnx.py")
+
+        config = {}
+        config_path = os.path.join(model_dir, "backend_config.json")
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        self.normalize = config.get("normalize", True)
+        self.model_id = backend_model_id("onnx", {"model_dir": model_dir, "quantized": quantized})
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=config.get("max_seq_length", 256))
+        self.tokenizer.enable_padding(pad_id=config.get("pad_token_id", 0), pad_token=config.get("pad_token", "[PAD]"))
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def encode(self, texts: List[str], batch_size: int = 32, convert_to_numpy: bool = True) -> np.ndarray:
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            token_embeddings = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real (non-padding) tokens
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if self.normalize:
+                pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            outputs.append(pooled.astype(np.float32))
+        return np.vstack(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+
+
+def backend_model_id(name: str, options: Dict[str, Any]) -> str:
+    """model_id a backend will report, without loading it."""
+    if name == "onnx":
+        model_dir = options.get("model_dir", "")
+        config_path = os.path.join(model_dir, "backend_config.json")
+        model_name = os.path.basename(os.path.normpath(model_dir))
+        if os.path.exists(config_path):
+            with open(config_path, 'r', encoding='utf-8') as f:
+                model_name = json.load(f).get("model_name", model_name)
+        return f"onnx{'-int8' if options.get('quantized', True) else ''}:{model_name}"
+    return options.get("model_name", MODEL_NAME)
+
+
+def create_backend(name: str = "sentence-transformers", **options) -> EmbeddingBackend:
+    """Instantiate an embedding backend by its config.json name."""
+    if name == "sentence-transformers":
+        return SentenceTransformerBackend(**options)
+    if name == "onnx":
+        return OnnxBackend(**options)
+    raise ValueError(f"Unknown embedding backend {name}")
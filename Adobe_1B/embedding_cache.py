@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+
+import os
+import json
+import hashlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Content-addressed, size-capped store of float32 embeddings on disk.
+
+    Vectors live in a memory-mapped ``vectors.f32`` file, one row per slot.
+    ``index.json`` maps ``hash(model name + normalized text)`` to its slot and
+    last-use tick so the least recently used rows are evicted once the cache
+    holds ``max_entries`` vectors.
+    """
+
+    VECTORS_FILE = "vectors.f32"
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir: str, model_name: str, max_entries: int = 100000):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.dim = 0
+        self.capacity = 0
+        self.tick = 0
+        self.entries: Dict[str, List[int]] = {}  # key -> [slot, last_used_tick]
+        self.free_slots: List[int] = []
+        self.vectors: Optional[np.memmap] = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    @property
+    def vectors_path(self) -> str:
+        return os.path.join(self.cache_dir, self.VECTORS_FILE)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.cache_dir, self.INDEX_FILE)
+
+    def key(self, text: str) -> str:
+        """Hash the model name and whitespace-normalized text into a cache key."""
+        normalized = " ".join(text.split())
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(normalized.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _load(self):
+        """Open an existing cache, discarding it if it is unreadable or from another model."""
+        if not os.path.exists(self.index_path) or not os.path.exists(self.vectors_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get("model") != self.model_name:
+                logger.info(f"Embedding cache at {self.cache_dir} belongs to another model, resetting")
+                return
+            self.dim = int(index["dim"])
+            self.capacity = int(index["capacity"])
+            self.tick = int(index.get("tick", 0))
+            self.entries = {k: list(v) for k, v in index["entries"].items()}
+            if self.capacity and self.dim:
+                self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                         shape=(self.capacity, self.dim))
+            used = {slot for slot, _ in self.entries.values()}
+            self.free_slots = [slot for slot in range(self.capacity - 1, -1, -1) if slot not in used]
+            self._evict(len(self.entries) - self.max_entries)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not read embedding cache at {self.cache_dir}: {e}")
+            self.dim = self.capacity = self.tick = 0
+            self.entries, self.free_slots, self.vectors = {}, [], None
+
+    def _grow(self, needed: int):
+        """Enlarge the vector file so that at least ``needed`` slots exist."""
+        new_capacity = min(self.max_entries, max(needed, self.capacity * 2, 1024))
+        if new_capacity <= self.capacity:
+            return
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dim * 4)
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+",
+                                 shape=(new_capacity, self.dim))
+        self.free_slots = list(range(new_capacity - 1, self.capacity - 1, -1)) + self.free_slots
+        self.capacity = new_capacity
+
+    def _evict(self, count: int, keep: frozenset = frozenset()):
+        """Release the ``count`` least recently used slots not listed in ``keep``."""
+        if count <= 0:
+            return
+        candidates = [item for item in self.entries.items() if item[0] not in keep]
+        oldest = sorted(candidates, key=lambda item: item[1][1])[:count]
+        for key, (slot, _) in oldest:
+            del self.entries[key]
+            self.free_slots.append(slot)
+        self.evictions += len(oldest)
+
+    def lookup(self, texts: List[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """Return cached vectors by text position and the positions that missed."""
+        found = {}
+        missing = []
+        for i, text in enumerate(texts):
+            entry = self.entries.get(self.key(text))
+            if entry is None or self.vectors is None:
+                missing.append(i)
+                continue
+            self.tick += 1
+            entry[1] = self.tick
+            found[i] = np.array(self.vectors[entry[0]])
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def store(self, texts: List[str], embeddings: np.ndarray):
+        """Insert vectors for the given texts, evicting old entries when full."""
+        if not texts:
+            return
+        if not self.dim:
+            self.dim = int(embeddings.shape[1])
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {embeddings.shape[1]} does not match cache dimension {self.dim}")
+
+        # Texts beyond the cap would only evict each other, so keep the last ones
+        if len(texts) > self.max_entries:
+            texts, embeddings = texts[-self.max_entries:], embeddings[-self.max_entries:]
+
+        keys = frozenset(self.key(text) for text in texts)
+        new_keys = keys - set(self.entries)
+        overflow = len(self.entries) + len(new_keys) - self.max_entries
+        self._evict(overflow, keep=keys)
+        if len(self.entries) + len(new_keys) > self.capacity:
+            self._grow(len(self.entries) + len(new_keys))
+
+        for text, vector in zip(texts, embeddings):
+            key = self.key(text)
+            self.tick += 1
+            if key in self.entries:
+                self.entries[key][1] = self.tick
+                continue
+            slot = self.free_slots.pop()
+            self.vectors[slot] = vector
+            self.entries[key] = [slot, self.tick]
+
+    def save(self):
+        """Flush vectors and atomically rewrite the index."""
+        if self.vectors is not None:
+            self.vectors.flush()
+        index = {
+            "model": self.model_name,
+            "dim": self.dim,
+            "capacity": self.capacity,
+            "tick": self.tick,
+            "entries": self.entries
+        }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def reset_stats(self):
+        """Zero the hit/miss/eviction counters, e.g. at the start of a run."""
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Counters reported in the output metadata."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries)
+        }
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Export the sentence-transformers model to ONNX with int8 weights for the "onnx" backend.
+
+Run once where the model and torch are available (build machine or a dev box):
+
+    python export_onnx.py --output models/minilm-onnx
+    python export_onnx.py --model /path/to/local/all-MiniLM-L6-v2 --output models/minilm-onnx
+
+The output directory holds model.onnx, model_quantized.onnx, tokenizer.json and
+backend_config.json; point embedding_backend_options.model_dir at it.
+"""
+
+import os
+import json
+import inspect
+import argparse
+import logging
+
+from embedding_backends import MODEL_NAME
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def export(model_name: str, output_dir: str, opset: int = 14):
+    """Write the float32 and dynamically quantized int8 ONNX graphs plus tokenizer files."""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    class TokenEmbeddings(torch.nn.Module):
+        # Keyword call so the graph inputs do not depend on forward()'s positional order
+        def __init__(self, auto_model, input_names):
+            super().__init__()
+            self.auto_model = auto_model
+            self.input_names = input_names
+
+        def forward(self, *inputs):
+            return self.auto_model(**dict(zip(self.input_names, inputs)))[0]
+
+    os.makedirs(output_dir, exist_ok=True)
+    st_model = SentenceTransformer(model_name, device="cpu")
+    transformer = st_model[0]
+    auto_model = transformer.auto_model.eval()
+    tokenizer = transformer.tokenizer
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    model_path = os.path.join(output_dir, "model.onnx")
+    export_options = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_options["dynamo"] = False  # newer torch defaults to the dynamo exporter
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(auto_model, input_names),
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+            **export_options
+        )
+    logger.info(f"Wrote {model_path}")
+
+    quantized_path = os.path.join(output_dir, "model_quantized.onnx")
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(f"Wrote {quantized_path}")
+
+    tokenizer.save_pretrained(output_dir)  # fast tokenizers write tokenizer.json
+    if not os.path.exists(os.path.join(output_dir, "tokenizer.json")):
+        raise RuntimeError(f"{model_name} has no fast tokenizer; tokenizer.json was not written")
+
+    normalize = any(type(module).__name__ == "Normalize" for module in st_model)
+    backend_config = {
+        "model_name": os.path.basename(os.path.normpath(model_name)),
+        "max_seq_length": st_model.max_seq_length,
+        "normalize": normalize,
+        "pad_token_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token
+    }
+    with open(os.path.join(output_dir, "backend_config.json"), 'w', encoding='utf-8') as f:
+        json.dump(backend_config, f, indent=2)
+    logger.info(f"Export complete: {output_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=MODEL_NAME, help="model name or local directory")
+    parser.add_argument("--output", required=True, help="output directory")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+    export(args.model, args.output, args.opset)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+
+import os
+import time
+import asyncio
+import cProfile
+import pstats
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Set to a file path to dump a cProfile/pstats profile of the run there
+PROFILE_ENV = "PIPELINE_PROFILE"
+
+
+class Instrumentation:
+    """Accumulates per-stage wall times and counters, overall and per document."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.documents: Dict[str, Dict[str, Any]] = defaultdict(lambda: defaultdict(int))
+        self.queues: Dict[str, List[int]] = defaultdict(list)  # depth after each put
+
+    @contextmanager
+    def stage(self, name: str, document: Optional[str] = None):
+        """Time a block of code under ``name`` (and under the document, if given)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] += elapsed
+            if document is not None:
+                self.documents[document][f"{name}_seconds"] += elapsed
+
+    def count(self, name: str, value: int = 1, document: Optional[str] = None):
+        self.counters[name] += value
+        if document is not None:
+            self.documents[document][name] += value
+
+    def queue_depth(self, name: str, depth: int):
+        self.queues[name].append(depth)
+    
+    def merge_document(self, document: str, stats: Dict[str, Any]):
+        """Fold in the stats a worker process collected for one document."""
+        for name, value in stats.get("stages", {}).items():
+            self.stages[name] += value
+            self.documents[document][f"{name}_seconds"] += value
+        for name, value in stats.get("counters", {}).items():
+            self.count(name, value, document)
+
+    def export(self) -> Dict[str, Any]:
+        """Plain-dict form, small enough to return from a worker process."""
+        return {"stages": dict(self.stages), "counters": dict(self.counters)}
+
+    def report(self) -> Dict[str, Any]:
+        """Rounded summary for the output metadata."""
+        return {
+            "stages_seconds": {name: round(value, 4) for name, value in self.stages.items()},
+            "counters": dict(self.counters),
+            "queue_depth": {
+                name: {"max": max(depths), "mean": round(sum(depths) / len(depths), 2)}
+                for name, depths in self.queues.items() if depths
+            },
+            "documents": {
+                document: {name: round(value, 4) if isinstance(value, float) else value
+                           for name, value in values.items()}
+                for document, values in self.documents.items()
+            }
+        }
+
+
+class MeteredQueue(asyncio.Queue):
+    """Bounded asyncio queue that records its depth after every put under ``name``."""
+
+    def __init__(self, maxsize: int, name: str, stats: Instrumentation):
+        super().__init__(maxsize)
+        self.name = name
+        self.stats = stats
+
+    async def put(self, item):
+        await super().put(item)
+        self.stats.queue_depth(self.name, self.qsize())
+
+
+@contextmanager
+def profile_if_requested(env_var: str = PROFILE_ENV, top: int = 25):
+    """Run the block under cProfile when ``env_var`` names an output file."""
+    path = os.environ.get(env_var)
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        stats = pstats.Stats(profiler).sort_stats("cumulative")
+        logger.info(f"Profile written to {path}")
+        stats.print_stats(top)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+
+import re
+from array import array
+from typing import Dict, List, Tuple
+import numpy as np
+
+from vector_index import top_k
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or our that the their this "
+    "to was we were what when which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of texts, stored as an inverted index.
+
+    Postings are CSR arrays: the rows containing term ``t`` are
+    ``doc_ids[offsets[t]:offsets[t + 1]]`` with their term frequencies in ``tfs``, so a
+    query only touches the postings of its own terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = 0
+        self.vocabulary: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int64)
+        self.tfs = np.zeros(0, dtype=np.float64)
+        self.idf = np.zeros(0, dtype=np.float64)
+        self.length_norms = np.zeros(0, dtype=np.float64)
+
+    def build(self, texts: List[str]) -> "BM25Index":
+        """Index the given texts; text i is returned as id i by search."""
+        self.size = n = len(texts)
+        vocabulary: Dict[str, int] = {}
+        term_ids, rows = array("q"), array("q")
+        lengths = np.zeros(n, dtype=np.float64)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[row] = len(tokens)
+            term_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+            rows.extend([row] * len(tokens))
+        self.vocabulary = vocabulary
+
+        # One posting per (term, row) pair, grouped by term
+        pairs, counts = np.unique(np.asarray(term_ids, dtype=np.int64) * max(n, 1) + np.asarray(rows, dtype=np.int64),
+                                  return_counts=True)
+        self.doc_ids = pairs % max(n, 1)
+        self.tfs = counts.astype(np.float64)
+        self.offsets = np.searchsorted(pairs // max(n, 1), np.arange(len(vocabulary) + 1))
+        document_frequency = np.diff(self.offsets)
+        self.idf = np.log1p((n - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = lengths.mean() if n else 0.0
+        self.length_norms = self.k1 * (1 - self.b + self.b * lengths / max(average_length, 1e-9))
+        return self
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every text for the query (0 for texts sharing no term with it)."""
+        scores = np.zeros(self.size, dtype=np.float64)
+        for token in dict.fromkeys(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            ids, tfs = self.doc_ids[start:end], self.tfs[start:end]
+            scores[ids] += self.idf[term] * tfs * (self.k1 + 1) / (tfs + self.length_norms[ids])
+        return scores
+
+    def search(self, query: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (text ids, scores) of up to k matching texts, best first."""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores > 0)
+        best = top_k(scores[matched], k)
+        return matched[best], scores[matched][best]
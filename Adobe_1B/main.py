@@ -2,85 +2,171 @@
 
 
 import os
+import sys
 import json
 import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
-import fitz  # PyMuPDF
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator
 import re
+import argparse
+import asyncio
+from array import array
 from collections import defaultdict
+from itertools import repeat
 import numpy as np
-from sentence_transformers import SentenceTransformer
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from embedding_cache import EmbeddingCache
+from vector_index import VectorIndex, collection_key, top_k
+from lexical_index import BM25Index
+from near_duplicates import DuplicateGrouper
+from budget import BudgetScheduler, BudgetExceeded, DEGRADATION_LEVELS
+from instrumentation import Instrumentation, MeteredQueue, profile_if_requested
+from embedding_backends import MODEL_NAME, create_backend, backend_model_id
+try:
+    from pdf_layout import LayoutStore, PageLayout, open_layout
+except ImportError:  # running from a checkout: the shared module sits at the repo root
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from pdf_layout import LayoutStore, PageLayout, open_layout
+from manifest import DocumentManifest
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class DocumentProcessor:
+class SpanTable:
+    """Columnar storage for the text spans of one page (one entry per column instead of a dict per span)."""
     
-    def __init__(self):
-        """Initialize the document processor with necessary models and configurations."""
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')  # ~90MB model
+    __slots__ = ("texts", "font_sizes", "is_bold", "is_heading", "bboxes")
+    
+    def __init__(self, keep_bbox: bool = False):
+        self.texts: List[str] = []
+        self.font_sizes = array('d')
+        self.is_bold = bytearray()
+        self.is_heading = bytearray()
+        self.bboxes = array('f') if keep_bbox else None  # x0, y0, x1, y1 per span
+    
+    def append(self, text: str, font_size: float, is_bold: bool, is_heading: bool, bbox=None):
+        self.texts.append(text)
+        self.font_sizes.append(font_size)
+        self.is_bold.append(1 if is_bold else 0)
+        self.is_heading.append(1 if is_heading else 0)
+        if self.bboxes is not None:
+            self.bboxes.extend(bbox)
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def plain_text(self) -> str:
+        """Page text rebuilt from the spans."""
+        return "\n".join(self.texts)
+
+def chunk_text(text: str, max_tokens: int, overlap: int = 0) -> List[str]:
+    """Split text into windows of at most max_tokens whitespace tokens; consecutive windows share overlap tokens.
+    
+    Text that already fits is returned unchanged as a single chunk. The overlap must be
+    smaller than max_tokens, or windows would not advance past the end of the text.
+    """
+    if overlap >= max_tokens:
+        raise ValueError(f"chunk overlap ({overlap}) must be smaller than max_tokens ({max_tokens})")
+    words = text.split()
+    if len(words) <= max_tokens:
+        return [text]
+    step = max(1, max_tokens - overlap)
+    return [" ".join(words[start:start + max_tokens]) for start in range(0, len(words) - overlap, step)]
+
+class HeadingClassifier:
+    """Span-level heading heuristic with the section patterns compiled into one regex.
+    
+    Cheap checks (font size, bold flag, first character) run before the regex; the
+    result matches evaluating each pattern with re.match in turn.
+    """
+    
+    def __init__(self, patterns: List[str], size_threshold: float = 12):
+        self.size_threshold = size_threshold
+        self.pattern = re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+        # The first-character prefilter is only valid if every pattern starts with [A-Z] or a digit
+        self.prefilter = all(pattern.startswith((r'^[A-Z]', r'^\d')) for pattern in patterns)
+    
+    def is_heading(self, text: str, font_size: float, is_bold: bool) -> bool:
+        if font_size > self.size_threshold or is_bold:
+            return True
+        first = text[0]
+        if (not self.prefilter or "A" <= first <= "Z" or first.isdigit()) and self.pattern.match(text):
+            return True
+        return text.isupper() and len(text.split()) <= 8
+
+class DocumentExtractor:
+    """PDF parsing and section detection, kept free of the model so it can run in worker processes."""
+    
+    def __init__(self, corpus_dir: Optional[str] = None, page_workers: int = 1,
+                 split_pages: Optional[int] = None):
+        """Initialize the section detection patterns, the optional span corpus and page-range parsing."""
         self.section_patterns = [
             r'^[A-Z][A-Z\s]+$',  # ALL CAPS headings
             r'^\d+\.\s+[A-Z]',   # Numbered sections
             r'^[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*$',  # Title Case headings
             r'^\d+\.\d+\s+[A-Z]',  # Sub-numbered sections
         ]
+        self.heading_classifier = HeadingClassifier(self.section_patterns)
+        self.corpus_dir = corpus_dir
+        self.corpus = LayoutStore(corpus_dir) if corpus_dir else None
+        self.page_workers = max(1, int(page_workers))
+        self.split_pages = split_pages
+        
+    def iter_pages(self, pdf_path: str, include_text: bool = False,
+                   keep_bbox: bool = False) -> Iterator[Dict[str, Any]]:
+        """Yield one page's spans at a time so callers can reduce pages without holding the document.
+        
+        Pages come from pdf_layout, which parses each one once with get_text("dict"); the
+        non-empty spans are kept in a SpanTable. Plain page text ("full_text") and span
+        bboxes are only kept when requested. With a corpus (a pdf_layout store, which 1A's
+        --corpus can share), a PDF's layout is written there on first parse and read back
+        (memory-mapped) afterwards instead of opening the PDF. With page_workers > 1, a
+        PDF long enough for it to pay off (split_pages, or a threshold measured on its
+        first pages) is parsed in page ranges by that many processes, still yielded in order.
+        """
+        with open_layout(pdf_path, self.corpus, workers=self.page_workers,
+                         split_pages=self.split_pages) as layout:
+            for page_num, page in enumerate(layout.pages()):
+                yield self._page_data(page_num, self._span_table(page, keep_bbox), include_text)
+    
+    def _span_table(self, page: PageLayout, keep_bbox: bool) -> SpanTable:
+        """Run the heading heuristic over the stripped, non-empty spans of a page."""
+        page_sections = SpanTable(keep_bbox)
+        bboxes = page.bboxes.tolist() if keep_bbox else repeat(None)
+        for text, font_size, font_flags, bbox in zip(page.texts, page.sizes.tolist(),
+                                                     page.flags.tolist(), bboxes):
+            text_content = text.strip()
+            if text_content:
+                self._add_span(page_sections, text_content, font_size, font_flags, bbox)
+        return page_sections
+    
+    def _add_span(self, page_sections: SpanTable, text_content: str, font_size: float,
+                  font_flags: int, bbox):
+        # Determine if this looks like a heading
+        is_bold = font_flags & 2**4  # Bold flag
+        
+        # Heuristic for heading detection
+        is_heading = self.heading_classifier.is_heading(text_content, font_size, is_bold)
         
-    def extract_text_from_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
+        page_sections.append(text_content, font_size, is_bold, is_heading, bbox)
+    
+    def _page_data(self, page_num: int, page_sections: SpanTable, include_text: bool) -> Dict[str, Any]:
+        page_data = {
+            "page_num": page_num + 1,
+            "sections": page_sections
+        }
+        if include_text:
+            page_data["full_text"] = page_sections.plain_text()
+        return page_data
+    
+    def extract_text_from_pdf(self, pdf_path: str, include_text: bool = False,
+                              keep_bbox: bool = False) -> List[Dict[str, Any]]:
         """Extract text and structure from PDF with page information."""
         try:
-            doc = fitz.open(pdf_path)
-            pages_data = []
-            
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text = page.get_text()
-                
-                # Extract text blocks with positioning info
-                blocks = page.get_text("dict")["blocks"]
-                page_sections = []
-                
-                for block in blocks:
-                    if "lines" in block:
-                        for line in block["lines"]:
-                            for span in line["spans"]:
-                                text_content = span["text"].strip()
-                                if text_content:
-                                    # Determine if this looks like a heading
-                                    font_size = span["size"]
-                                    font_flags = span["flags"]
-                                    is_bold = font_flags & 2**4  # Bold flag
-                                    
-                                    # Heuristic for heading detection
-                                    is_heading = (
-                                        font_size > 12 or 
-                                        is_bold or 
-                                        any(re.match(pattern, text_content) for pattern in self.section_patterns) or
-                                        len(text_content.split()) <= 8 and text_content.isupper()
-                                    )
-                                    
-                                    page_sections.append({
-                                        "text": text_content,
-                                        "page": page_num + 1,
-                                        "font_size": font_size,
-                                        "is_bold": is_bold,
-                                        "is_heading": is_heading,
-                                        "bbox": span["bbox"]
-                                    })
-                
-                pages_data.append({
-                    "page_num": page_num + 1,
-                    "full_text": text,
-                    "sections": page_sections
-                })
-            
-            doc.close()
-            return pages_data
-            
+            return list(self.iter_pages(pdf_path, include_text, keep_bbox))
         except Exception as e:
             logger.error(f"Error processing PDF {pdf_path}: {e}")
             return []
@@ -92,17 +178,18 @@ class DocumentProcessor:
         for page_data in pages_data:
             page_sections = page_data["sections"]
             
-            for section in page_sections:
-                if section["is_heading"]:
+            for text, font_size, is_heading in zip(page_sections.texts, page_sections.font_sizes,
+                                                   page_sections.is_heading):
+                if is_heading:
                     # Determine heading level based on font size and formatting
                     level = "H1"
-                    if section["font_size"] < 14:
+                    if font_size < 14:
                         level = "H2"
-                    elif section["font_size"] < 12:
+                    elif font_size < 12:
                         level = "H3"
                     
                     # Clean and improve section title
-                    title = section["text"].strip()
+                    title = text.strip()
                     if len(title) < 3:  # Skip very short titles
                         continue
                     
@@ -129,7 +216,7 @@ class DocumentProcessor:
                     sections.append({
                         "title": title,
                         "level": level,
-                        "page": section["page"],
+                        "page": page_data["page_num"],
                         "document": page_data.get("document_name", "Unknown")
                     })
         
@@ -144,8 +231,8 @@ class DocumentProcessor:
             current_section = None
             current_content = []
             
-            for section in page_sections:
-                if section["is_heading"]:
+            for text, is_heading in zip(page_sections.texts, page_sections.is_heading):
+                if is_heading:
                     # Save previous section content if it exists
                     if current_section and current_content:
                         full_text = " ".join(current_content)
@@ -153,15 +240,15 @@ class DocumentProcessor:
                                                     subsections.append({
                             "section": current_section,
                             "text": full_text,
-                            "page": section.get("page", page_data.get("page", 1)),
+                            "page": page_data["page_num"],
                             "document": page_data.get("document_name", "Unknown")
                         })
                     
-                    current_section = section["text"]
+                    current_section = text
                     current_content = []
-                elif current_section and not section["is_heading"]:
+                elif current_section:
                     # This is content under a section
-                    current_content.append(section["text"])
+                    current_content.append(text)
             
             # Don't forget the last section
             if current_section and current_content:
@@ -182,39 +269,656 @@ class DocumentProcessor:
         
         return subsections
     
+    def process_document(self, pdf_path: str, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Parse one PDF into its compact sections and subsections.
+        
+        Pages are streamed: sections and subsections only depend on the spans of their own
+        page, so each page is reduced and dropped before the next one is parsed. With a
+        deadline (a time.time() value), parsing stops there and the result is marked
+        "truncated", keeping the pages read so far.
+        """
+        document_name = Path(pdf_path).name
+        logger.info(f"Processing {document_name}")
+        stats = Instrumentation()
+        sections = []
+        subsections = []
+        truncated = False
+        
+        try:
+            pages = self.iter_pages(str(pdf_path))
+            while True:
+                if deadline is not None and time.time() >= deadline:
+                    truncated = True
+                    pages.close()  # also discards a partly written corpus entry
+                    break
+                # Extract text and structure
+                with stats.stage("extract_text_from_pdf"):
+                    page_data = next(pages, None)
+                if page_data is None:
+                    break
+                page_data["document_name"] = document_name
+                
+                # Identify sections
+                with stats.stage("identify_sections"):
+                    page_sections = self.identify_sections([page_data])
+                sections.extend(page_sections)
+                
+                # Extract subsections
+                with stats.stage("extract_subsections"):
+                    subsections.extend(self.extract_subsections([page_data], page_sections))
+                
+                stats.count("pages")
+                stats.count("spans", len(page_data["sections"]))
+        except Exception as e:
+            # Like extract_text_from_pdf, a document that fails to parse contributes nothing
+            logger.error(f"Error processing PDF {pdf_path}: {e}")
+            sections, subsections = [], []
+        
+        stats.count("sections", len(sections))
+        stats.count("subsections", len(subsections))
+        
+        result = {"document": document_name, "sections": sections, "subsections": subsections,
+                  "stats": stats.export()}
+        if truncated:
+            result["truncated"] = True
+        return result
+
+
+_worker_extractor = None
+
+
+def _extract_document(pdf_path: str, corpus_dir: Optional[str] = None,
+                      deadline: Optional[float] = None, page_workers: int = 1,
+                      split_pages: Optional[int] = None) -> Dict[str, Any]:
+    """Process pool entry point; reuses one extractor per worker process."""
+    global _worker_extractor
+    settings = (corpus_dir, max(1, int(page_workers)), split_pages)
+    if _worker_extractor is None or (_worker_extractor.corpus_dir, _worker_extractor.page_workers,
+                                     _worker_extractor.split_pages) != settings:
+        _worker_extractor = DocumentExtractor(*settings)
+    return _worker_extractor.process_document(pdf_path, deadline)
+
+
+class DocumentProcessor(DocumentExtractor):
+    
+    def __init__(self, batch_size: int = 32, normalize_embeddings: bool = True,
+                 cache_dir: Optional[str] = None, cache_max_entries: int = 100000,
+                 workers: Optional[int] = None, model: Any = None, top_k: int = 5,
+                 index_mode: str = "flat", index_nprobe: int = 8, index_quantize: bool = False,
+                 index_dir: Optional[str] = None, manifest_dir: Optional[str] = None,
+                 backend: str = "sentence-transformers", backend_options: Optional[Dict[str, Any]] = None,
+                 corpus_dir: Optional[str] = None, chunk_tokens: int = 0, chunk_overlap: int = 32,
+                 chunk_aggregation: str = "max", queue_size: int = 4, prefilter_candidates: int = 0,
+                 dedup_threshold: float = 0.0, time_budget: Optional[float] = None,
+                 page_workers: Optional[int] = None, split_pages: Optional[int] = None):
+        """Initialize the document processor; the model is loaded on first use unless one is passed in."""
+        super().__init__(corpus_dir, page_workers or 1, split_pages)
+        self.requested_page_workers = page_workers  # None: sized per run, see size_page_workers
+        self._model = model  # ~90MB model, see the model property
+        self.backend = backend
+        self.backend_options = dict(backend_options or {})
+        # Identifies the embedding space for the cache and persisted indexes
+        self.model_id = getattr(model, "model_id", MODEL_NAME) if model is not None \
+            else backend_model_id(backend, self.backend_options)
+        self.startup_timings: Dict[str, float] = {}
+        self.batch_size = max(1, int(batch_size))
+        self.normalize_embeddings = normalize_embeddings
+        self.embedding_cache = EmbeddingCache(cache_dir, self.model_id, cache_max_entries) if cache_dir else None
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.top_k = max(1, int(top_k))
+        self.index_mode = index_mode
+        self.index_nprobe = index_nprobe
+        self.index_quantize = index_quantize
+        self.index_dir = index_dir
+        self.instrumentation = Instrumentation()
+        self.manifest = DocumentManifest(manifest_dir) if manifest_dir else None
+        if chunk_aggregation not in ("max", "mean"):
+            raise ValueError(f"Unknown chunk aggregation {chunk_aggregation}")
+        self.chunk_tokens = max(0, int(chunk_tokens))  # 0 embeds each subsection whole
+        self.chunk_overlap = max(0, int(chunk_overlap))
+        if 0 < self.chunk_tokens <= self.chunk_overlap:
+            raise ValueError(f"chunk_overlap ({self.chunk_overlap}) must be smaller than chunk_tokens ({self.chunk_tokens})")
+        self.chunk_aggregation = chunk_aggregation
+        self.queue_size = max(1, int(queue_size))
+        self.prefilter_candidates = max(0, int(prefilter_candidates))  # 0 embeds and ranks every text
+        # Near-duplicate Jaccard threshold; 0 embeds every text separately
+        self.deduplicator = DuplicateGrouper(dedup_threshold) if dedup_threshold > 0 else None
+        self.budget = BudgetScheduler(time_budget) if time_budget else None  # wall-clock seconds per run
+        self._prefetched: Optional[Dict[str, np.ndarray]] = None  # raw embeddings from the pipeline's embed stage
+    
+    @property
+    def model(self):
+        """Embedding backend (see embedding_backends), imported and loaded lazily on first access."""
+        if self._model is None:
+            start = time.perf_counter()
+            self._model = create_backend(self.backend, **self.backend_options)
+            loaded = time.perf_counter() - start
+            self.startup_timings["import_seconds"] = self._model.import_seconds
+            self.startup_timings["model_load_seconds"] = loaded - self._model.import_seconds
+            logger.info(f"Loaded {self.model_id} ({self.backend} backend): "
+                        f"import {self.startup_timings['import_seconds']:.2f}s, "
+                        f"model load {self.startup_timings['model_load_seconds']:.2f}s")
+        return self._model
+    
+    @model.setter
+    def model(self, model):
+        self._model = model
+    
+    def warm_up(self):
+        """Load the model and run a first encode so later queries skip cold-start costs."""
+        self._encode_batches(["warm up"])
+        return self
+    
+    def extract_documents(self, pdf_files: List[Path]) -> List[Dict[str, Any]]:
+        """Parse PDFs concurrently in a process pool, returning results in input order.
+        
+        With a manifest, unchanged files reuse their stored results and only new or
+        modified files are parsed.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        if self.manifest is not None:
+            for pdf_path in pdf_files:
+                cached = self.manifest.lookup(str(pdf_path))
+                if cached is not None:
+                    cached["reused"] = True
+                    results[str(pdf_path)] = cached
+        to_parse = [str(pdf_path) for pdf_path in pdf_files if str(pdf_path) not in results]
+        self.size_page_workers(1 if self.workers <= 1 else min(self.workers, len(to_parse)))
+        
+        if self.workers <= 1 or len(to_parse) <= 1:
+            parsed = [self.process_document(pdf_path) for pdf_path in to_parse]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(to_parse))) as executor:
+                parsed = list(executor.map(_extract_document, to_parse, repeat(self.corpus_dir), repeat(None),
+                                           repeat(self.page_workers), repeat(self.split_pages)))
+        
+        for pdf_path, result in zip(to_parse, parsed):
+            results[pdf_path] = result
+            if self.manifest is not None:
+                self.manifest.store(pdf_path, result)
+        if self.manifest is not None:
+            self.manifest.save()
+        
+        return [results[str(pdf_path)] for pdf_path in pdf_files]
+    
+    def size_page_workers(self, parsers: int):
+        """Page-range processes per large PDF: page_workers if configured, else the CPUs left per parse worker.
+        
+        Each parse worker may start its own page-range pool, so the default keeps parse
+        workers times page workers within the CPU count; split_threshold assumes idle cores.
+        """
+        cpus = os.cpu_count() or 1
+        self.page_workers = max(1, int(self.requested_page_workers or cpus // max(1, parsers)))
+    
+    def run_pipeline(self, pdf_files: List[Path]) -> List[Dict[str, Any]]:
+        """extract_documents as an asyncio read -> parse -> embed pipeline, keeping the embeddings for ranking."""
+        self._prefetched = {}
+        return asyncio.run(self._pipeline([str(pdf_path) for pdf_path in pdf_files]))
+    
+    async def _pipeline(self, pdf_files: List[str]) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        stats = self.instrumentation
+        parsers = min(self.workers, len(pdf_files)) if self.workers > 1 else 1
+        self.size_page_workers(parsers)
+        read_queue = MeteredQueue(self.queue_size, "read", stats)
+        parsed_queue = MeteredQueue(self.queue_size, "parse", stats)
+        io_pool = ThreadPoolExecutor(1)  # manifest lookups and stores share one thread
+        embed_pool = ThreadPoolExecutor(1)
+        parse_pool = ProcessPoolExecutor(max_workers=parsers) if parsers > 1 else None
+        results: Dict[int, Dict[str, Any]] = {}
+        budget = self.budget
+        order = range(len(pdf_files))
+        if budget is not None:
+            order = sorted(order, key=lambda i: os.path.getsize(pdf_files[i]))
+        ahead_of_time = not self.prefilter_candidates
+        if budget is not None:
+            budget.encode_deadline = budget.parse_deadline  # embedding ahead only overlaps parsing
+        
+        async def read():
+            for i in order:
+                pdf_path = pdf_files[i]
+                cached = await loop.run_in_executor(io_pool, self._read_document, pdf_path)
+                await read_queue.put((i, pdf_path, cached))
+            for _ in range(parsers):
+                await read_queue.put(None)
+        
+        async def parse():
+            while (item := await read_queue.get()) is not None:
+                i, pdf_path, result = item
+                if result is None:
+                    if budget is not None and not budget.admit(os.path.getsize(pdf_path)):
+                        await parsed_queue.put((i, self._skipped_document(pdf_path)))
+                        continue
+                    deadline = budget.parse_deadline if budget is not None else None
+                    start = time.perf_counter()
+                    if parse_pool is None:
+                        result = self.process_document(pdf_path, deadline)
+                    else:
+                        result = await loop.run_in_executor(parse_pool, _extract_document, pdf_path,
+                                                            self.corpus_dir, deadline, self.page_workers,
+                                                            self.split_pages)
+                    if result.get("truncated"):
+                        budget.truncated.append(result["document"])
+                        await parsed_queue.put((i, result))
+                        continue  # incomplete, so neither cached nor used for the estimate
+                    if budget is not None:
+                        budget.observe_parse(os.path.getsize(pdf_path), time.perf_counter() - start)
+                    if self.manifest is not None:
+                        await loop.run_in_executor(io_pool, self.manifest.store, pdf_path, result)
+                await parsed_queue.put((i, result))
+        
+        async def embed():
+            prefetch = ahead_of_time
+            while (item := await parsed_queue.get()) is not None:
+                i, result = item
+                if prefetch:
+                    try:
+                        await loop.run_in_executor(embed_pool, self._embed_document, result)
+                    except BudgetExceeded:
+                        prefetch = False  # the rest is embedded, or degraded, by ranking
+                results[i] = result
+        
+        try:
+            embedder = asyncio.ensure_future(embed())
+            await asyncio.gather(read(), *(parse() for _ in range(parsers)))
+            await parsed_queue.put(None)
+            await embedder
+        finally:
+            if budget is not None:
+                budget.encode_deadline = None
+            io_pool.shutdown()
+            embed_pool.shutdown()
+            if parse_pool is not None:
+                parse_pool.shutdown()
+        if self.manifest is not None:
+            self.manifest.save()
+        return [results[i] for i in range(len(pdf_files))]
+    
+    def _read_document(self, pdf_path: str) -> Optional[Dict[str, Any]]:
+        """Pipeline read stage: the manifest's stored result, or None if the file must be parsed."""
+        if self.manifest is not None:
+            cached = self.manifest.lookup(pdf_path)
+            if cached is not None:
+                cached["reused"] = True
+                return cached
+            return None
+        # No manifest to hash the file: read it anyway so the parse stage hits the page cache
+        with open(pdf_path, "rb") as f:
+            while f.read(1 << 20):
+                pass
+        return None
+    
+    def _skipped_document(self, pdf_path: str) -> Dict[str, Any]:
+        """Empty result for a document the time budget left no room to parse."""
+        document_name = Path(pdf_path).name
+        logger.warning(f"Skipping {document_name}: not expected to finish parsing within the time budget")
+        self.budget.skipped.append(document_name)
+        return {"document": document_name, "sections": [], "subsections": [], "stats": {}, "skipped": True}
+    
+    def _embed_document(self, result: Dict[str, Any]):
+        """Pipeline embed stage: embed one document's section titles and subsection texts (group representatives only)."""
+        with self.instrumentation.stage("embed_documents"):
+            for texts in ([section["title"] for section in result["sections"]],
+                          self.chunk_subsections(result["subsections"])[0]):
+                if self.deduplicator is not None and texts:
+                    texts = [texts[i] for i in self.deduplicator.group(texts)[0]]
+                self.encode_texts(texts)
+    
+    def _encode_batches(self, texts: List[str]) -> np.ndarray:
+        """Run the model over texts in length-sorted mini-batches, returning rows in input order."""
+        # Sort by length so each mini-batch pads to a similar sequence length
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = None
+        model = self.model
+        
+        for start in range(0, len(order), self.batch_size):
+            if self.budget is not None and self.budget.stop_encoding():
+                raise BudgetExceeded()
+            batch_idx = order[start:start + self.batch_size]
+            batch_texts = [texts[i] for i in batch_idx]
+            batch_start = time.perf_counter()
+            batch = model.encode(batch_texts, batch_size=len(batch_idx), convert_to_numpy=True)
+            if self.budget is not None:
+                self.budget.observe_encode(self.budget.text_units(batch_texts), time.perf_counter() - batch_start)
+            if "first_encode_seconds" not in self.startup_timings:
+                self.startup_timings["first_encode_seconds"] = time.perf_counter() - batch_start
+                logger.info(f"First encode took {self.startup_timings['first_encode_seconds']:.2f}s")
+            if embeddings is None:
+                embeddings = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            embeddings[batch_idx] = batch
+        
+        self.instrumentation.count("texts_encoded", len(texts))
+        
+        return embeddings
+    
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode texts as float32 rows in input order, reusing cached embeddings when available."""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        
+        if self._prefetched is None:
+            embeddings = self._cached_or_encoded(texts)
+        else:
+            # Texts embedded ahead of time by the pipeline's embed stage
+            missing = [i for i, text in enumerate(texts) if text not in self._prefetched]
+            if missing:
+                computed = self._cached_or_encoded([texts[i] for i in missing])
+                for i, vector in zip(missing, computed):
+                    self._prefetched[texts[i]] = vector
+            embeddings = np.stack([self._prefetched[text] for text in texts])
+        
+        if self.normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.maximum(norms, 1e-12)
+        
+        return embeddings
+    
+    def _cached_or_encoded(self, texts: List[str]) -> np.ndarray:
+        """Unnormalized embeddings from the embedding cache, encoding (and caching) the misses."""
+        if self.embedding_cache is None:
+            return self._encode_batches(texts)
+        found, missing = self.embedding_cache.lookup(texts)
+        computed = self._encode_batches([texts[i] for i in missing]) if missing else None
+        if computed is not None:
+            self.embedding_cache.store([texts[i] for i in missing], computed)
+        dim = computed.shape[1] if computed is not None else next(iter(found.values())).shape[0]
+        embeddings = np.empty((len(texts), dim), dtype=np.float32)
+        for i, vector in found.items():
+            embeddings[i] = vector
+        if computed is not None:
+            embeddings[missing] = computed
+        return embeddings
+    
+    def encode_collapsed(self, texts: List[str]) -> np.ndarray:
+        """encode_texts, but with deduplication on only one text per duplicate group is embedded.
+        
+        The representative's row is copied to every member, so members score the same
+        as their representative. Collapsed texts are counted as encodes saved.
+        """
+        if self.deduplicator is None or not texts:
+            return self.encode_texts(texts)
+        stats = self.instrumentation
+        with stats.stage("dedup"):
+            representatives, group_of, exact = self.deduplicator.group(texts)
+        stats.count("dedup_exact_duplicates", exact)
+        stats.count("dedup_near_duplicates", len(texts) - len(representatives) - exact)
+        stats.count("dedup_encodes_saved", len(texts) - len(representatives))
+        return self.encode_texts([texts[i] for i in representatives])[group_of]
+    
+    def score_texts(self, query_embedding: np.ndarray, texts: List[str]) -> np.ndarray:
+        """Score texts against a query embedding with a single matrix-vector product."""
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        return self.encode_collapsed(texts) @ query_embedding
+    
+    def new_index(self) -> VectorIndex:
+        """Empty vector index with the configured mode."""
+        return VectorIndex(self.index_mode, nprobe=self.index_nprobe, quantize=self.index_quantize)
+    
+    def build_index(self, texts: List[str]) -> VectorIndex:
+        """Embed texts into a vector index, reusing a persisted index for the same collection."""
+        index_path = None
+        if self.index_dir:
+            options = [self.index_mode, self.index_quantize, self.normalize_embeddings]
+            if self.deduplicator is not None:
+                options.append(f"dedup={self.deduplicator.threshold}")  # members carry their representative's vector
+            key = collection_key(self.model_id, texts, *options)
+            index_path = os.path.join(self.index_dir, f"{key}.npz")
+            if os.path.exists(index_path):
+                return VectorIndex.load(index_path, nprobe=self.index_nprobe)
+        
+        index = self.new_index().build(self.encode_collapsed(texts))
+        if index_path:
+            os.makedirs(self.index_dir, exist_ok=True)
+            index.save(index_path)
+        return index
+    
     def calculate_relevance_scores(self, sections: List[Dict[str, Any]], 
                                  subsections: List[Dict[str, Any]],
                                  persona: str, job_to_be_done: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
-        """Calculate relevance scores for sections and subsections based on persona and job."""
+        """Return the top_k sections and subsections for the persona and job, best first."""
+        
+        stats = self.instrumentation
         
         # Create embeddings for persona and job
-        query_embedding = self.model.encode([f"{persona} {job_to_be_done}"])
-        
-        # Score sections
-        for section in sections:
-            section_embedding = self.model.encode([section["title"]])
-            similarity = np.dot(query_embedding, section_embedding.T) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(section_embedding)
-            )
-            section["importance_rank"] = float(similarity[0][0])
-        
-        # Score subsections
-        for subsection in subsections:
-            subsection_embedding = self.model.encode([subsection["text"]])
-            similarity = np.dot(query_embedding, subsection_embedding.T) / (
-                np.linalg.norm(query_embedding) * np.linalg.norm(subsection_embedding)
-            )
-            subsection["importance_rank"] = float(similarity[0][0])
-        
-        # Sort by relevance
-        sections.sort(key=lambda x: x["importance_rank"], reverse=True)
-        subsections.sort(key=lambda x: x["importance_rank"], reverse=True)
-        
-        # Assign integer ranks to sections (1, 2, 3, etc.)
-        for i, section in enumerate(sections):
-            section["importance_rank"] = i + 1
-        
-        return sections, subsections
+        with stats.stage("encode_query"):
+            query_embedding = self.encode_texts([f"{persona} {job_to_be_done}"])[0]
+        
+        if self.prefilter_candidates:
+            return self.rank_prefiltered(sections, subsections, [f"{persona} {job_to_be_done}"],
+                                         query_embedding[None, :])[0]
+        
+        # Index sections and subsections, then retrieve the top_k of each
+        with stats.stage("index_sections"):
+            section_index = self.build_index([section["title"] for section in sections])
+        with stats.stage("index_subsections"):
+            chunks, owners = self.chunk_subsections(subsections)
+            if self.chunk_tokens:
+                stats.count("subsection_chunks", len(chunks))
+            subsection_index = self.build_index(chunks)
+        
+        with stats.stage("search"):
+            return self.rank_hits(sections, subsections,
+                                  section_index.search(query_embedding, self.top_k),
+                                  self.search_subsections(subsection_index, owners, query_embedding[None, :])[0])
+    
+    def calculate_relevance_scores_batch(self, sections: List[Dict[str, Any]],
+                                         subsections: List[Dict[str, Any]],
+                                         queries: List[Tuple[str, str]]) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """calculate_relevance_scores for many (persona, job) queries over the same sections.
+        
+        The queries are encoded together and scored against each index with one
+        matrix-matrix product, so every extra query costs a single embedding.
+        """
+        if not queries:
+            return []
+        stats = self.instrumentation
+        
+        query_texts = [f"{persona} {job_to_be_done}" for persona, job_to_be_done in queries]
+        with stats.stage("encode_query"):
+            query_embeddings = self.encode_texts(query_texts)
+        stats.count("queries", len(queries))
+        
+        if self.prefilter_candidates:
+            return self.rank_prefiltered(sections, subsections, query_texts, query_embeddings)
+        
+        with stats.stage("index_sections"):
+            section_index = self.build_index([section["title"] for section in sections])
+        with stats.stage("index_subsections"):
+            chunks, owners = self.chunk_subsections(subsections)
+            if self.chunk_tokens:
+                stats.count("subsection_chunks", len(chunks))
+            subsection_index = self.build_index(chunks)
+        
+        with stats.stage("search"):
+            section_hits = section_index.search_batch(query_embeddings, self.top_k)
+            subsection_hits = self.search_subsections(subsection_index, owners, query_embeddings)
+            return [self.rank_hits(sections, subsections, hits, sub_hits)
+                    for hits, sub_hits in zip(section_hits, subsection_hits)]
+    
+    def rank_prefiltered(self, sections: List[Dict[str, Any]], subsections: List[Dict[str, Any]],
+                         query_texts: List[str],
+                         query_embeddings: np.ndarray) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """Two-stage ranking: BM25 picks candidate sections and subsections, which alone are embedded and re-ranked.
+        
+        Candidates are scored exactly against the query embedding (no vector index), so with
+        a pool covering every text the result equals the exhaustive ranking.
+        """
+        stats = self.instrumentation
+        with stats.stage("prefilter"):
+            section_lexicon = BM25Index().build([section["title"] for section in sections])
+            subsection_lexicon = BM25Index().build([subsection["text"] for subsection in subsections])
+            pools = [(self.candidate_pool(section_lexicon, query), self.candidate_pool(subsection_lexicon, query))
+                     for query in query_texts]
+        
+        results = []
+        for query_embedding, (section_pool, subsection_pool) in zip(query_embeddings, pools):
+            stats.count("prefilter_section_candidates", len(section_pool))
+            stats.count("prefilter_subsection_candidates", len(subsection_pool))
+            with stats.stage("rerank_sections"):
+                section_scores = self.score_texts(query_embedding, [sections[i]["title"] for i in section_pool])
+                best = top_k(section_scores, self.top_k)
+            with stats.stage("rerank_subsections"):
+                chunks, owners = self.chunk_subsections([subsections[i] for i in subsection_pool])
+                if self.chunk_tokens:
+                    stats.count("subsection_chunks", len(chunks))
+                chunk_scores = self.score_texts(query_embedding, chunks)
+                if self.chunk_tokens:
+                    ids, scores = self.aggregate_chunk_hits((np.arange(len(chunks)), chunk_scores), owners)
+                else:
+                    ids = top_k(chunk_scores, self.top_k)
+                    scores = chunk_scores[ids]
+            results.append(self.rank_hits(sections, subsections,
+                                          (section_pool[best], section_scores[best]),
+                                          (subsection_pool[ids], scores)))
+        return results
+    
+    def candidate_pool(self, lexicon: BM25Index, query: str) -> np.ndarray:
+        """Rows of the prefilter_candidates best BM25 scores, in input order.
+        
+        Like lexical_hits, texts sharing no term with the query (score 0) fill the pool
+        after the matches, so a pool at least as large as the collection ranks every text.
+        """
+        scores = lexicon.scores(query)
+        self.instrumentation.count("prefilter_lexical_matches", int(np.count_nonzero(scores)))
+        return np.sort(top_k(scores, min(self.prefilter_candidates, lexicon.size)))
+    
+    def rank_within_budget(self, sections: List[Dict[str, Any]], subsections: List[Dict[str, Any]],
+                           queries: List[Tuple[str, str]]) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """calculate_relevance_scores_batch at the most thorough DEGRADATION_LEVELS entry the time budget allows."""
+        budget = self.budget
+        stats = self.instrumentation
+        query_texts = [f"{persona} {job_to_be_done}" for persona, job_to_be_done in queries]
+        lexical = len(DEGRADATION_LEVELS) - 1
+        level = lexical
+        query_embeddings = None
+        budget.enforce = True
+        try:
+            if not budget.expired():
+                try:
+                    with stats.stage("encode_query"):
+                        query_embeddings = self.encode_texts(query_texts)
+                    with stats.stage("budget_plan"):
+                        titles = self._not_embedded(section["title"] for section in sections)
+                        chunks = self._not_embedded(self.chunk_subsections(subsections)[0])
+                        headings = self._not_embedded(subsection["section"] for subsection in subsections)
+                    if budget.seconds_per_unit() is None:
+                        with stats.stage("budget_probe"):
+                            probe = max(1, self.batch_size // 2)
+                            self.encode_texts(titles[:probe] + chunks[:probe])
+                    level = budget.plan([
+                        budget.text_units(titles) + budget.text_units(chunks),
+                        budget.text_units(titles) + budget.text_units(headings),
+                        budget.text_units(titles),
+                        0
+                    ])
+                except BudgetExceeded:
+                    level = lexical
+            while True:
+                budget.level = level
+                try:
+                    with stats.stage(f"rank_{DEGRADATION_LEVELS[level]}"):
+                        return self.rank_at_level(level, sections, subsections, queries, query_texts,
+                                                  query_embeddings)
+                except BudgetExceeded:
+                    logger.warning(f"Time budget ran out at level {DEGRADATION_LEVELS[level]}, degrading")
+                    level += 1
+        finally:
+            budget.enforce = False
+            logger.info(f"Ranked at degradation level {level} ({DEGRADATION_LEVELS[level]})")
+    
+    def _not_embedded(self, texts: Iterable[str]) -> List[str]:
+        """Texts ranking would still embed: the distinct duplicate-group representatives not embedded ahead of time."""
+        texts = list(texts)
+        if self.deduplicator is not None and texts:
+            texts = [texts[i] for i in self.deduplicator.group(texts)[0]]
+        prefetched = self._prefetched or {}
+        return [text for text in dict.fromkeys(texts) if text not in prefetched]
+    
+    def rank_at_level(self, level: int, sections: List[Dict[str, Any]], subsections: List[Dict[str, Any]],
+                      queries: List[Tuple[str, str]], query_texts: List[str],
+                      query_embeddings: Optional[np.ndarray]) -> List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """Rank with one of the DEGRADATION_LEVELS strategies."""
+        if level == 0:
+            return self.calculate_relevance_scores_batch(sections, subsections, queries)
+        
+        if level == len(DEGRADATION_LEVELS) - 1:
+            section_lexicon = BM25Index().build([section["title"] for section in sections])
+            section_hits = [self.lexical_hits(section_lexicon, query) for query in query_texts]
+        else:
+            section_index = self.build_index([section["title"] for section in sections])
+            section_hits = section_index.search_batch(query_embeddings, self.top_k)
+        
+        if level == 1:
+            heading_index = self.build_index([subsection["section"] for subsection in subsections])
+            subsection_hits = heading_index.search_batch(query_embeddings, self.top_k)
+        else:
+            subsection_lexicon = BM25Index().build([subsection["text"] for subsection in subsections])
+            subsection_hits = [self.lexical_hits(subsection_lexicon, query) for query in query_texts]
+        
+        return [self.rank_hits(sections, subsections, hits, sub_hits)
+                for hits, sub_hits in zip(section_hits, subsection_hits)]
+    
+    def lexical_hits(self, lexicon: BM25Index, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Top_k (ids, BM25 scores) over every text, so non-matching texts still fill the list."""
+        scores = lexicon.scores(query)
+        ids = top_k(scores, self.top_k)
+        return ids, scores[ids].astype(np.float32)
+    
+    def chunk_subsections(self, subsections: List[Dict[str, Any]]) -> Tuple[List[str], np.ndarray]:
+        """Texts to embed for the subsections and, per text, the index of the subsection it came from.
+        
+        With chunk_tokens set, long bodies become overlapping token-bounded chunks, so nothing
+        is cut off at the model's sequence limit and every encode has a bounded length.
+        """
+        if not self.chunk_tokens:
+            return [subsection["text"] for subsection in subsections], np.arange(len(subsections))
+        chunks, owners = [], []
+        for i, subsection in enumerate(subsections):
+            pieces = chunk_text(subsection["text"], self.chunk_tokens, self.chunk_overlap)
+            chunks.extend(pieces)
+            owners.extend([i] * len(pieces))
+        return chunks, np.array(owners, dtype=np.int64)
+    
+    def search_subsections(self, index: VectorIndex, owners: np.ndarray,
+                           query_embeddings: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top_k (subsection ids, scores) per query row, aggregating chunk scores per subsection."""
+        if not self.chunk_tokens:
+            return index.search_batch(query_embeddings, self.top_k)
+        # Every chunk score is aggregated, so the raw scores are taken without sorting them
+        return [self.aggregate_chunk_hits(hits, owners) for hits in index.score_batch(query_embeddings)]
+    
+    def aggregate_chunk_hits(self, hits: Tuple[np.ndarray, np.ndarray],
+                             owners: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Combine chunk hits into one max or mean score per subsection and keep the top_k."""
+        chunk_ids, chunk_scores = hits
+        if len(chunk_ids) == 0:
+            return chunk_ids, chunk_scores
+        chunk_owners = owners[chunk_ids]
+        counts = np.bincount(chunk_owners, minlength=int(owners.max()) + 1)
+        if self.chunk_aggregation == "max":
+            scores = np.full(len(counts), -np.inf, dtype=np.float64)
+            np.maximum.at(scores, chunk_owners, chunk_scores)
+        else:
+            scores = np.bincount(chunk_owners, weights=chunk_scores, minlength=len(counts)) / np.maximum(counts, 1)
+        subsection_ids = np.flatnonzero(counts)
+        scores = scores[subsection_ids]
+        best = top_k(scores, self.top_k)
+        return subsection_ids[best], scores[best].astype(np.float32)
+    
+    def rank_hits(self, sections: List[Dict[str, Any]], subsections: List[Dict[str, Any]],
+                  section_hits: Tuple[np.ndarray, np.ndarray],
+                  subsection_hits: Tuple[np.ndarray, np.ndarray]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Turn (ids, scores) index hits into ranked copies with integer section ranks (1, 2, 3, etc.)."""
+        ranked_sections = [
+            dict(sections[i], importance_rank=rank)
+            for rank, i in enumerate(section_hits[0], start=1)
+        ]
+        ranked_subsections = [
+            dict(subsections[i], importance_rank=float(score))
+            for i, score in zip(*subsection_hits)
+        ]
+        return ranked_sections, ranked_subsections
     
     def refine_text(self, text: str) -> str:
         """Refine and clean text content."""
@@ -230,10 +934,12 @@ class DocumentProcessor:
         
         return text.strip()
     
-    def process_documents(self, input_dir: str, persona: str, job_to_be_done: str) -> Dict[str, Any]:
-        """Main processing function that handles all documents."""
-        start_time = time.time()
+    def parse_collection(self, input_dir: str) -> Tuple[List[str], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Parse (or reuse) every PDF in input_dir into document names, sections and subsections.
         
+        Starts a fresh self.instrumentation for the run. Section and subsection embeddings
+        are computed as documents arrive and held until the caller's ranking is done.
+        """
         # Get all PDF files
         pdf_files = list(Path(input_dir).glob("*.pdf"))
         if not pdf_files:
@@ -241,38 +947,101 @@ class DocumentProcessor:
         
         logger.info(f"Processing {len(pdf_files)} PDF files")
         
+        if self.embedding_cache is not None:
+            self.embedding_cache.reset_stats()
+        if self.manifest is not None:
+            self.manifest.reset_stats()
+            # Forget documents deleted from the input directory
+            self.manifest.prune(pdf_files, scope=input_dir)
+        self.instrumentation = stats = Instrumentation()
+        if self.budget is not None:
+            self.budget.start()
+        
         all_sections = []
         all_subsections = []
         input_documents = []
         
-        # Process each PDF
-        for pdf_path in pdf_files:
-            logger.info(f"Processing {pdf_path.name}")
-            
-            # Add document name to input list
-            input_documents.append(pdf_path.name)
-            
-            # Extract text and structure
-            pages_data = self.extract_text_from_pdf(str(pdf_path))
-            
-            # Add document name to pages data
-            for page_data in pages_data:
-                page_data["document_name"] = pdf_path.name
-            
-            # Identify sections
-            sections = self.identify_sections(pages_data)
-            all_sections.extend(sections)
-            
-            # Extract subsections
-            subsections = self.extract_subsections(pages_data, sections)
-            all_subsections.extend(subsections)
+        # Parse (in parallel when workers > 1) and embed PDFs
+        with stats.stage("pipeline_wall"):
+            results = self.run_pipeline(pdf_files)
+        for result in results:
+            input_documents.append(result["document"])
+            all_sections.extend(result["sections"])
+            all_subsections.extend(result["subsections"])
+            if result.get("reused"):
+                stats.count("documents_reused")
+            else:
+                stats.merge_document(result["document"], result["stats"])
+        
+        return input_documents, all_sections, all_subsections
+    
+    def process_documents(self, input_dir: str, persona: str, job_to_be_done: str) -> Dict[str, Any]:
+        """Main processing function that handles all documents."""
+        start_time = time.time()
+        input_documents, all_sections, all_subsections = self.parse_collection(input_dir)
+        stats = self.instrumentation
         
         # Calculate relevance scores
-        scored_sections, scored_subsections = self.calculate_relevance_scores(
-            all_sections, all_subsections, persona, job_to_be_done
-        )
+        with stats.stage("calculate_relevance_scores"):
+            if self.budget is None:
+                scored_sections, scored_subsections = self.calculate_relevance_scores(
+                    all_sections, all_subsections, persona, job_to_be_done
+                )
+            else:
+                scored_sections, scored_subsections = self.rank_within_budget(
+                    all_sections, all_subsections, [(persona, job_to_be_done)]
+                )[0]
+        self._prefetched = None
+        
+        if self.embedding_cache is not None:
+            self.embedding_cache.save()
+        
+        with stats.stage("build_output"):
+            output = self.build_output(input_documents, persona, job_to_be_done,
+                                       scored_sections, scored_subsections, start_time)
+        output["metadata"]["timings"] = stats.report()
+        if self.budget is not None:
+            output["metadata"]["budget"] = self.budget.report()
         
-        # Prepare output
+        logger.info(f"Processing completed in {time.time() - start_time:.2f} seconds")
+        return output
+    
+    def process_queries(self, input_dir: str, queries: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Batch mode: parse the collection once and return one output per (persona, job) query."""
+        start_time = time.time()
+        input_documents, all_sections, all_subsections = self.parse_collection(input_dir)
+        stats = self.instrumentation
+        
+        with stats.stage("calculate_relevance_scores"):
+            if self.budget is None:
+                ranked = self.calculate_relevance_scores_batch(all_sections, all_subsections, queries)
+            else:
+                ranked = self.rank_within_budget(all_sections, all_subsections, queries)
+        self._prefetched = None
+        
+        if self.embedding_cache is not None:
+            self.embedding_cache.save()
+        
+        with stats.stage("build_output"):
+            outputs = [
+                self.build_output(input_documents, persona, job_to_be_done,
+                                  scored_sections, scored_subsections, start_time)
+                for (persona, job_to_be_done), (scored_sections, scored_subsections) in zip(queries, ranked)
+            ]
+        timings = stats.report()
+        budget = self.budget.report() if self.budget is not None else None
+        for output in outputs:
+            output["metadata"]["timings"] = timings
+            if budget is not None:
+                output["metadata"]["budget"] = budget
+        
+        logger.info(f"Processed {len(queries)} queries in {time.time() - start_time:.2f} seconds")
+        return outputs
+    
+    def build_output(self, input_documents: List[str], persona: str, job_to_be_done: str,
+                     scored_sections: List[Dict[str, Any]], scored_subsections: List[Dict[str, Any]],
+                     start_time: float) -> Dict[str, Any]:
+        """Assemble the output JSON from ranked sections and subsections."""
         output = {
             "metadata": {
                 "input_documents": input_documents,
@@ -288,7 +1057,7 @@ class DocumentProcessor:
                     "importance_rank": section["importance_rank"],
                     "page_number": section["page"]
                 }
-                for section in scored_sections[:5]  # Top 5 most relevant sections
+                for section in scored_sections[:self.top_k]  # Most relevant sections
             ],
             "subsection_analysis": [
                 {
@@ -296,15 +1065,77 @@ class DocumentProcessor:
                     "refined_text": self.refine_text(subsection["text"]),
                     "page_number": subsection["page"]
                 }
-                for subsection in scored_subsections[:5]  # Top 5 most relevant subsections
+                for subsection in scored_subsections[:self.top_k]  # Most relevant subsections
             ]
         }
         
-        logger.info(f"Processing completed in {time.time() - start_time:.2f} seconds")
+        if self.embedding_cache is not None:
+            output["metadata"]["embedding_cache"] = self.embedding_cache.stats()
+        if self.manifest is not None:
+            output["metadata"]["manifest"] = self.manifest.stats()
+        if self.startup_timings:
+            output["metadata"]["startup_timings"] = dict(self.startup_timings)
+        
         return output
 
+def load_config() -> Dict[str, Any]:
+    """Read config.json next to this script, falling back to defaults when it is missing."""
+    config_path = os.path.join(os.path.dirname(__file__), "config.json")
+    if os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def create_processor(config: Dict[str, Any]) -> DocumentProcessor:
+    """Build a DocumentProcessor from the scoring options in config.json."""
+    return DocumentProcessor(
+        batch_size=config.get("batch_size", 32),
+        normalize_embeddings=config.get("normalize_embeddings", True),
+        cache_dir=config.get("embedding_cache_dir"),
+        cache_max_entries=config.get("embedding_cache_max_entries", 100000),
+        workers=config.get("workers"),
+        top_k=config.get("top_k", 5),
+        index_mode=config.get("index_mode", "flat"),
+        index_nprobe=config.get("index_nprobe", 8),
+        index_quantize=config.get("index_quantize", False),
+        index_dir=config.get("index_dir"),
+        manifest_dir=config.get("manifest_dir"),
+        backend=config.get("embedding_backend", "sentence-transformers"),
+        backend_options=config.get("embedding_backend_options"),
+        corpus_dir=config.get("corpus_dir"),
+        chunk_tokens=config.get("chunk_tokens", 0),
+        chunk_overlap=config.get("chunk_overlap", 32),
+        chunk_aggregation=config.get("chunk_aggregation", "max"),
+        queue_size=config.get("pipeline_queue_size", 4),
+        prefilter_candidates=config.get("prefilter_candidates", 0),
+        dedup_threshold=config.get("dedup_threshold", 0.0),
+        time_budget=config.get("time_budget_seconds"),
+        page_workers=config.get("page_workers"),
+        split_pages=config.get("split_pages")
+    )
+
+def load_queries(config: Dict[str, Any], queries_path: Optional[str] = None) -> Dict[str, Tuple[str, str]]:
+    """Named (persona, job) queries for batch mode, from a JSON file or config's sample_configurations.
+    
+    The file uses the sample_configurations layout: {"name": {"persona": ..., "job_to_be_done": ...}}.
+    """
+    if queries_path:
+        with open(queries_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+    else:
+        entries = config.get("sample_configurations", {})
+    if not entries:
+        raise ValueError("Batch mode needs queries: pass a queries file or add sample_configurations to config.json")
+    return {name: (entry["persona"], entry["job_to_be_done"]) for name, entry in entries.items()}
+
 def main():
     """Main entry point for the application."""
+    parser = argparse.ArgumentParser(description="Rank PDF sections for a persona and job-to-be-done.")
+    parser.add_argument("--batch", nargs="?", const="", metavar="QUERIES_JSON",
+                        help="rank for many queries at once (default: config.json sample_configurations), "
+                             "writing output/<name>.json per query")
+    args = parser.parse_args()
+    
     try:
         # Input paths - use local paths for development
         input_dir = "input"
@@ -322,22 +1153,30 @@ def main():
             raise ValueError(f"No PDF files found in {input_dir}")
         
         # Load configuration
-        config_path = os.path.join(os.path.dirname(__file__), "config.json")
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            persona = config.get("persona", "Research Analyst")
-            job_to_be_done = config.get("job_to_be_done", "Analyze key findings and methodologies from research documents")
-        else:
-            # Fallback defaults
-            persona = "Research Analyst"
-            job_to_be_done = "Analyze key findings and methodologies from research documents"
+        config = load_config()
+        persona = config.get("persona", "Research Analyst")
+        job_to_be_done = config.get("job_to_be_done", "Analyze key findings and methodologies from research documents")
         
         # Initialize processor
-        processor = DocumentProcessor()
+        processor = create_processor(config)
+        if config.get("preload_model", False):
+            processor.warm_up()
+        
+        if args.batch is not None:
+            queries = load_queries(config, args.batch)
+            with profile_if_requested():
+                results = processor.process_queries(input_dir, list(queries.values()))
+            for name, result in zip(queries, results):
+                file_name = re.sub(r'[^\w.-]+', '_', name)
+                output_path = os.path.join(output_dir, f"{file_name}.json")
+                with open(output_path, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, indent=2, ensure_ascii=False)
+            logger.info(f"Wrote {len(results)} outputs to {output_dir}")
+            return
         
-        # Process documents
-        result = processor.process_documents(input_dir, persona, job_to_be_done)
+        # Process documents (profiled when PIPELINE_PROFILE is set)
+        with profile_if_requested():
+            result = processor.process_documents(input_dir, persona, job_to_be_done)
         
         # Write output
         output_path = os.path.join(output_dir, "output.json")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+
+import os
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+import logging
+
+from pdf_layout import file_digest
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1  # bump when stored results change (heading heuristic, section or subsection fields)
+
+
+class DocumentManifest:
+    """Tracks input PDFs by path, size, mtime and content hash, with their cached extraction results.
+
+    A document is reused when size and mtime are unchanged, or when they changed but the
+    content hash did not (e.g. a touched or re-copied file). Results are stored one JSON
+    file per content hash under ``manifest_dir``, so identical copies share one; each
+    lookup renames the result's sections and subsections to the file it was asked for.
+    A manifest written with another MANIFEST_VERSION is discarded with its results.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, manifest_dir: str):
+        self.manifest_dir = manifest_dir
+        self.entries: Dict[str, Dict[str, Any]] = {}  # absolute path -> size, mtime, sha256
+        self.reused = 0
+        self.parsed = 0
+        self.removed = 0
+        os.makedirs(manifest_dir, exist_ok=True)
+        manifest_path = os.path.join(manifest_dir, self.MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                self.entries = manifest["documents"]
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+            else:
+                if manifest.get("version") != MANIFEST_VERSION:
+                    logger.info(f"Discarding manifest {manifest_path} from version {manifest.get('version')}")
+                    stale, self.entries = self.entries, {}
+                    for sha256 in {entry["sha256"] for entry in stale.values()}:
+                        self._drop_result(sha256)
+
+    def _result_path(self, sha256: str) -> str:
+        return os.path.join(self.manifest_dir, f"{sha256}.json")
+
+    def lookup(self, pdf_path: str) -> Optional[Dict[str, Any]]:
+        """Cached extraction result for an unchanged file, or None if it must be (re)parsed."""
+        key = str(Path(pdf_path).resolve())
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        stat = os.stat(pdf_path)
+        if (stat.st_size, stat.st_mtime_ns) != (entry["size"], entry["mtime_ns"]):
+            if stat.st_size != entry["size"] or file_digest(pdf_path) != entry["sha256"]:
+                return None
+            entry["mtime_ns"] = stat.st_mtime_ns
+        try:
+            with open(self._result_path(entry["sha256"]), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+        document_name = Path(pdf_path).name
+        result["document"] = document_name
+        for item in result.get("sections", []) + result.get("subsections", []):
+            item["document"] = document_name
+        self.reused += 1
+        return result
+
+    def store(self, pdf_path: str, result: Dict[str, Any]):
+        """Record a freshly parsed file and its result."""
+        stat = os.stat(pdf_path)
+        sha256 = file_digest(pdf_path)
+        key = str(Path(pdf_path).resolve())
+        previous = self.entries.get(key)
+        self.entries[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+        with open(self._result_path(sha256), 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        if previous and previous["sha256"] != sha256:
+            self._drop_result(previous["sha256"])
+        self.parsed += 1
+
+    def prune(self, present: Iterable[str], scope: Optional[str] = None):
+        """Forget files under ``scope`` (a directory) that are no longer in ``present``."""
+        keep = {str(Path(path).resolve()) for path in present}
+        scope = str(Path(scope).resolve()) if scope else None
+        for key in list(self.entries):
+            if key in keep or (scope and os.path.dirname(key) != scope):
+                continue
+            self._drop_result(self.entries.pop(key)["sha256"])
+            self.removed += 1
+
+    def _drop_result(self, sha256: str):
+        # Identical copies of a file share one result file
+        if any(entry["sha256"] == sha256 for entry in self.entries.values()):
+            return
+        try:
+            os.remove(self._result_path(sha256))
+        except OSError:
+            pass
+
+    def save(self):
+        manifest_path = os.path.join(self.manifest_dir, self.MANIFEST_FILE)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_VERSION, "documents": self.entries}, f, indent=1)
+        os.replace(tmp_path, manifest_path)
+
+    def reset_stats(self):
+        self.reused = self.parsed = self.removed = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"reused": self.reused, "parsed": self.parsed, "removed": self.removed}
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import numpy as np
+
+WHITESPACE = re.compile(r"\s+")
+
+
+class DuplicateGrouper:
+    """Groups exact and near-duplicate texts so each group is embedded once.
+
+    Identical texts are grouped by hashing. The remaining distinct texts are compared
+    by character shingles: MinHash signatures are split into LSH bands, texts sharing a
+    band bucket are candidates, and a candidate joins a group when the Jaccard similarity
+    of its shingles with the group's representative reaches ``threshold``. Texts are
+    visited in input order and the first text of a group represents it, so the grouping
+    is deterministic.
+    """
+
+    def __init__(self, threshold: float = 0.9, shingle_size: int = 4, num_perm: int = 64,
+                 bands: int = 16, seed: int = 0):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.bands = bands
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash family: odd 64-bit multipliers, products wrap modulo 2**64
+        self.multipliers = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.offsets = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        """CRC32 hashes of the character shingles of the lowercased, whitespace-collapsed text."""
+        text = WHITESPACE.sub(" ", text.lower()).strip()
+        size = self.shingle_size
+        pieces = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+        return np.array(sorted(zlib.crc32(piece.encode("utf-8")) for piece in pieces), dtype=np.uint64)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        """MinHash signature: the minimum of each hash function over the shingles."""
+        with np.errstate(over="ignore"):
+            hashed = shingles[:, None] * self.multipliers[None, :] + self.offsets[None, :]
+        return (hashed >> np.uint64(32)).min(axis=0)
+
+    def group(self, texts: List[str]) -> Tuple[np.ndarray, np.ndarray, int]:
+        """Return (representative ids, group of each text as an index into them, exact duplicates)."""
+        first_seen: Dict[str, int] = {}
+        representatives: List[int] = []
+        group_of = np.empty(len(texts), dtype=np.int64)
+        rep_shingles: List[np.ndarray] = []
+        buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        exact = 0
+
+        for i, text in enumerate(texts):
+            if text in first_seen:
+                group_of[i] = group_of[first_seen[text]]
+                exact += 1
+                continue
+            first_seen[text] = i
+
+            shingles = self.shingles(text)
+            keys = [(band, chunk.tobytes())
+                    for band, chunk in enumerate(np.split(self.signature(shingles), self.bands))]
+            candidates = sorted({group for key in keys for group in buckets.get(key, ())})
+            match = next((group for group in candidates
+                          if self.jaccard(shingles, rep_shingles[group]) >= self.threshold), None)
+            if match is not None:
+                group_of[i] = match
+                continue
+
+            group_of[i] = len(representatives)
+            for key in keys:
+                buckets[key].append(len(representatives))
+            representatives.append(i)
+            rep_shingles.append(shingles)
+
+        return np.array(representatives, dtype=np.int64), group_of, exact
+
+    @staticmethod
+    def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+        """Jaccard similarity of two sorted, distinct shingle hash arrays."""
+        shared = len(np.intersect1d(a, b, assume_unique=True))
+        return shared / (len(a) + len(b) - shared)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+
+import os
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from urllib.parse import unquote
+import numpy as np
+import logging
+
+from main import DocumentProcessor, load_config, create_processor
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentStore:
+    """Keeps parsed documents and their embeddings resident so queries only embed the persona/job."""
+
+    def __init__(self, processor: DocumentProcessor):
+        self.processor = processor
+        self.documents: Dict[str, Dict[str, Any]] = {}  # name -> sections, subsections, embeddings
+        self.lock = threading.RLock()
+        self._indexes = None
+
+    def add_documents(self, pdf_paths: List[str]) -> List[Dict[str, Any]]:
+        """Parse and embed PDFs, replacing any already loaded document with the same name."""
+        results = self.processor.extract_documents([Path(path) for path in pdf_paths])
+        added = []
+        with self.lock:
+            for result in results:
+                result["section_embeddings"] = self.processor.encode_texts(
+                    [section["title"] for section in result["sections"]])
+                chunks, result["subsection_owners"] = self.processor.chunk_subsections(result["subsections"])
+                result["subsection_embeddings"] = self.processor.encode_texts(chunks)
+                self.documents.pop(result["document"], None)
+                self.documents[result["document"]] = result
+                added.append({
+                    "document": result["document"],
+                    "sections": len(result["sections"]),
+                    "subsections": len(result["subsections"])
+                })
+            self._indexes = None
+            if self.processor.embedding_cache is not None:
+                self.processor.embedding_cache.save()
+        return added
+
+    def remove_document(self, name: str) -> bool:
+        """Drop a document; returns False if it was not loaded."""
+        with self.lock:
+            if self.documents.pop(name, None) is None:
+                return False
+            self._indexes = None
+            return True
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            return [
+                {"document": name, "sections": len(doc["sections"]), "subsections": len(doc["subsections"])}
+                for name, doc in self.documents.items()
+            ]
+
+    def _stacked(self, key: str) -> np.ndarray:
+        blocks = [doc[key] for doc in self.documents.values() if len(doc[key])]
+        return np.vstack(blocks) if blocks else np.zeros((0, 0), dtype=np.float32)
+
+    def _stacked_owners(self) -> np.ndarray:
+        # Chunk owners are per document; shift them to positions in the combined subsection list
+        owners, offset = [], 0
+        for doc in self.documents.values():
+            owners.append(doc["subsection_owners"] + offset)
+            offset += len(doc["subsections"])
+        return np.concatenate(owners) if owners else np.zeros(0, dtype=np.int64)
+
+    def indexes(self):
+        """Vector indexes over all loaded documents (plus subsection chunk owners), rebuilt only after adds/removes."""
+        if self._indexes is None:
+            self._indexes = (self.processor.new_index().build(self._stacked("section_embeddings")),
+                             self.processor.new_index().build(self._stacked("subsection_embeddings")),
+                             self._stacked_owners())
+        return self._indexes
+
+    def query(self, persona: str, job_to_be_done: str) -> Dict[str, Any]:
+        """Rank the resident sections/subsections for one persona and job."""
+        start_time = time.time()
+        with self.lock:
+            if not self.documents:
+                raise ValueError("No documents loaded")
+            section_index, subsection_index, owners = self.indexes()
+            query_embedding = self.processor.encode_texts([f"{persona} {job_to_be_done}"])[0]
+
+            sections = [section for doc in self.documents.values() for section in doc["sections"]]
+            subsections = [subsection for doc in self.documents.values() for subsection in doc["subsections"]]
+            top_k = self.processor.top_k
+            scored_sections, scored_subsections = self.processor.rank_hits(
+                sections, subsections,
+                section_index.search(query_embedding, top_k),
+                self.processor.search_subsections(subsection_index, owners, query_embedding[None, :])[0])
+            return self.processor.build_output(list(self.documents), persona, job_to_be_done,
+                                               scored_sections, scored_subsections, start_time)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """JSON endpoints:
+
+    GET    /health                   liveness check
+    GET    /documents                loaded documents with section counts
+    POST   /documents                {"paths": [...]} parse and embed PDFs
+    DELETE /documents/<name>         unload a document
+    POST   /query                    {"persona": ..., "job_to_be_done": ...} ranked output
+    """
+
+    store: DocumentStore = None
+
+    def _send(self, status: int, payload: Any):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "documents": len(self.store.documents)})
+        elif self.path == "/documents":
+            self._send(200, {"documents": self.store.list_documents()})
+        else:
+            self._send(404, {"error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+            if self.path == "/query":
+                persona = request.get("persona")
+                job_to_be_done = request.get("job_to_be_done")
+                if not persona or not job_to_be_done:
+                    self._send(400, {"error": "persona and job_to_be_done are required"})
+                    return
+                self._send(200, self.store.query(persona, job_to_be_done))
+            elif self.path == "/documents":
+                paths = request.get("paths") or ([request["path"]] if request.get("path") else [])
+                missing = [path for path in paths if not os.path.isfile(path)]
+                if not paths or missing:
+                    self._send(400, {"error": f"PDF files not found: {missing or paths}"})
+                    return
+                self._send(200, {"added": self.store.add_documents(paths)})
+            else:
+                self._send(404, {"error": f"Unknown endpoint {self.path}"})
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"Error handling {self.path}: {e}")
+            self._send(500, {"error": str(e)})
+
+    def do_DELETE(self):
+        if not self.path.startswith("/documents/"):
+            self._send(404, {"error": f"Unknown endpoint {self.path}"})
+            return
+        name = unquote(self.path[len("/documents/"):])
+        if self.store.remove_document(name):
+            self._send(200, {"removed": name})
+        else:
+            self._send(404, {"error": f"Document {name} is not loaded"})
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+
+def serve(store: DocumentStore, host: str = "127.0.0.1", port: int = 8080, ready: Optional[threading.Event] = None):
+    """Run the HTTP server until interrupted."""
+    handler = type("BoundQueryHandler", (QueryHandler,), {"store": store})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    logger.info(f"Serving {len(store.documents)} documents on http://{host}:{httpd.server_address[1]}")
+    if ready is not None:
+        ready.set()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def main():
+    """Load the model and the input collection once, then answer queries over HTTP."""
+    parser = argparse.ArgumentParser(description="Persona-driven ranking server")
+    parser.add_argument("--input", default="input", help="directory of PDFs to load at startup")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    processor = create_processor(load_config()).warm_up()
+    store = DocumentStore(processor)
+    pdf_files = sorted(str(path) for path in Path(args.input).glob("*.pdf")) if os.path.isdir(args.input) else []
+    if pdf_files:
+        store.add_documents(pdf_files)
+
+    serve(store, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,45 @@
 
 import os
 import json
+import zlib
 import tempfile
 from pathlib import Path
-from main import DocumentProcessor
+from unittest.mock import patch
+import numpy as np
+import budget
+from budget import BudgetScheduler, DEGRADATION_LEVELS
+from embedding_cache import EmbeddingCache
+from vector_index import VectorIndex, top_k
+from near_duplicates import DuplicateGrouper
+from main import DocumentProcessor, chunk_text
+
+INPUT_DIR = Path(__file__).parent / "input"
+
+
+class HashingModel:
+    """Deterministic bag-of-words encoder, so ranking tests run without the model download."""
+    
+    model_id = "test-hashing-64"
+    
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, **kwargs):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[i, zlib.crc32(word.encode("utf-8")) % 64] += 1.0
+            vectors[i, 0] += 0.1
+        return vectors
+
+class FakeClock:
+    """Frozen stand-in for the time module in budget.py; tests move it by setting ``now``."""
+    
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def time(self):
+        return self.now
+    
+    def perf_counter(self):
+        return self.now
 
 def create_sample_pdf():
     """Create a simple sample PDF for testing."""
@@ -121,12 +157,318 @@ def test_constraints():
     
     print("All constraints satisfied!")
 
+def test_prefilter_full_pool_matches_exhaustive():
+    """A BM25 candidate pool at least as large as the collection reproduces the exhaustive ranking."""
+    processor = DocumentProcessor(model=HashingModel(), workers=1)
+    sections, subsections = [], []
+    for document in processor.extract_documents(sorted(INPUT_DIR.glob("*.pdf"))):
+        sections.extend(document["sections"])
+        subsections.extend(document["subsections"])
+    persona, job = "Food Contractor", "Prepare a vegetarian buffet-style dinner menu for a corporate gathering"
+    
+    exhaustive = processor.calculate_relevance_scores(sections, subsections, persona, job)
+    processor.prefilter_candidates = len(sections) + len(subsections)
+    prefiltered = processor.calculate_relevance_scores(sections, subsections, persona, job)
+    
+    assert prefiltered == exhaustive
+    counters = processor.instrumentation.counters
+    assert counters["prefilter_subsection_candidates"] == len(subsections)
+    print("Prefilter full-pool test passed!")
+
+def test_manifest_reuse_keeps_document_names():
+    """Identical PDFs share a stored result, but a re-run still reports each under its own name."""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_dir = Path(temp_dir) / "input"
+        input_dir.mkdir()
+        source = sorted(INPUT_DIR.glob("*.pdf"))[0]
+        for name in ("A.pdf", "B.pdf"):
+            (input_dir / name).write_bytes(source.read_bytes())
+        pdf_files = sorted(input_dir.glob("*.pdf"))
+        
+        for run in range(2):
+            processor = DocumentProcessor(model=HashingModel(), workers=1,
+                                          manifest_dir=str(Path(temp_dir) / "manifest"))
+            for pdf_path, result in zip(pdf_files, processor.extract_documents(pdf_files)):
+                assert result.get("reused", False) == (run == 1)
+                assert result["document"] == pdf_path.name
+                assert result["sections"] and result["subsections"]
+                assert {item["document"] for item in result["sections"] + result["subsections"]} == {pdf_path.name}
+    print("Manifest reuse test passed!")
+
+def test_budget_scheduler_admits_and_plans():
+    """Parse admission, level selection and encoding stops follow the scheduler's estimates and its clock."""
+    clock = FakeClock()
+    with patch.object(budget, "time", clock):
+        scheduler = BudgetScheduler(10, parse_share=0.5, reserve_seconds=1)
+        assert scheduler.admit(10**6)  # no parse estimate yet
+        scheduler.observe_parse(10**6, 1.0)
+        clock.now += 1
+        assert scheduler.admit(4 * 10**6)  # 4s expected, 4s left before the parse deadline
+        assert not scheduler.admit(5 * 10**6)
+        clock.now += 4
+        assert not scheduler.admit(1)  # past the parse deadline
+        
+        # 5ms per unit and 4s left after the reserve
+        scheduler.observe_encode(100, 0.5)
+        assert DEGRADATION_LEVELS[scheduler.plan([700, 500, 200, 0])] == "full"
+        assert DEGRADATION_LEVELS[scheduler.plan([1000, 800, 200, 0])] == "subsection_headings"
+        assert DEGRADATION_LEVELS[scheduler.plan([1000, 900, 200, 0])] == "titles_only"
+        assert DEGRADATION_LEVELS[scheduler.plan([1000, 900, 900, 0])] == "lexical"
+        
+        scheduler.encode_deadline = clock.now + 1
+        assert not scheduler.stop_encoding()
+        clock.now += 1
+        assert scheduler.stop_encoding()
+        scheduler.encode_deadline = None
+        assert not scheduler.stop_encoding()
+        scheduler.enforce = True
+        assert not scheduler.stop_encoding()
+        clock.now += 3
+        assert scheduler.expired() and scheduler.stop_encoding()
+        assert DEGRADATION_LEVELS[scheduler.plan([1, 1, 1, 0])] == "lexical"
+        
+        scheduler.level = 2
+        scheduler.skipped.append("late.pdf")
+        report = scheduler.report()
+        assert report["degradation"] == "titles_only" and report["documents_skipped"] == ["late.pdf"]
+        assert report["elapsed_seconds"] == 9 and report["estimated_encode_seconds_per_unit"] == 0.005
+    print("Budget scheduler test passed!")
+
+def test_budget_skips_and_truncates_documents():
+    """Documents past the parse deadline are skipped smallest first; ones parsing at the deadline are truncated."""
+    persona, job = "Food Contractor", "Prepare a vegetarian buffet-style dinner menu for a corporate gathering"
+    by_size = [path.name for path in sorted(INPUT_DIR.glob("*.pdf"), key=lambda path: path.stat().st_size)]
+    
+    # No parse share: every document is skipped, and no time is left to rank with the model
+    processor = DocumentProcessor(model=HashingModel(), workers=1, time_budget=10)
+    processor.budget = BudgetScheduler(10, parse_share=0.0, reserve_seconds=10)
+    report = processor.process_documents(str(INPUT_DIR), persona, job)["metadata"]["budget"]
+    assert report["documents_skipped"] == by_size and report["documents_truncated"] == []
+    assert report["degradation"] == "lexical"
+    
+    # The budget's clock says the parse deadline is 50s away, but the real clock is long past it:
+    # every document is admitted and stops before its first page
+    with patch.object(budget, "time", FakeClock(0.0)):
+        processor = DocumentProcessor(model=HashingModel(), workers=1, time_budget=100)
+        result = processor.process_documents(str(INPUT_DIR), persona, job)
+    report = result["metadata"]["budget"]
+    assert report["documents_truncated"] == by_size and report["documents_skipped"] == []
+    assert result["extracted_sections"] == [] and result["subsection_analysis"] == []
+    print("Budget skip and truncation test passed!")
+
+def test_budget_ranks_at_the_level_that_fits():
+    """rank_within_budget picks the level the estimates allow and falls back to BM25 once the budget is gone."""
+    processor = DocumentProcessor(model=HashingModel(), workers=1, time_budget=100)
+    sections, subsections = [], []
+    for document in processor.extract_documents(sorted(INPUT_DIR.glob("*.pdf"))):
+        sections.extend(document["sections"])
+        subsections.extend(document["subsections"])
+    queries = [("Food Contractor", "Prepare a vegetarian buffet-style dinner menu for a corporate gathering")]
+    query_texts = [f"{persona} {job}" for persona, job in queries]
+    scheduler = processor.budget
+    titles = scheduler.text_units(dict.fromkeys(section["title"] for section in sections))
+    headings = scheduler.text_units(dict.fromkeys(subsection["section"] for subsection in subsections))
+    
+    clock = FakeClock()
+    with patch.object(budget, "time", clock):
+        scheduler.start()
+        # About one second per unit, and time left for the titles but not the titles and headings
+        scheduler.observe_encode(10**6, 10**6)
+        clock.now += 100 - scheduler.reserve_seconds - (titles + headings / 2)
+        ranked = processor.rank_within_budget(sections, subsections, queries)
+        assert DEGRADATION_LEVELS[scheduler.level] == "titles_only"
+        query_embeddings = processor.encode_texts(query_texts)
+        assert ranked == processor.rank_at_level(2, sections, subsections, queries, query_texts, query_embeddings)
+        
+        clock.now += 100
+        ranked = processor.rank_within_budget(sections, subsections, queries)
+        assert scheduler.report()["degradation"] == "lexical"
+        assert ranked == processor.rank_at_level(3, sections, subsections, queries, query_texts, None)
+    print("Budget level selection test passed!")
+
+def test_embedding_cache_reload_and_eviction():
+    """Cached rows survive a reopen, and a smaller limit evicts the least recently used entries first."""
+    texts = ["alpha", "beta", "gamma", "delta"]
+    vectors = np.random.default_rng(0).standard_normal((len(texts), 8)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = EmbeddingCache(cache_dir, "test-model", max_entries=10)
+        cache.store(texts, vectors)
+        cache.lookup(["alpha"])  # alpha is now the most recently used
+        cache.save()
+        
+        reopened = EmbeddingCache(cache_dir, "test-model", max_entries=10)
+        found, missing = reopened.lookup(texts + ["epsilon"])
+        assert missing == [4]
+        assert all(np.array_equal(found[i], vectors[i]) for i in range(len(texts)))
+        assert reopened.stats() == {"hits": 4, "misses": 1, "evictions": 0, "entries": 4}
+        
+        # Last used: beta, gamma, delta, alpha
+        shrunk = EmbeddingCache(cache_dir, "test-model", max_entries=2)
+        assert shrunk.evictions == 2
+        found, missing = shrunk.lookup(texts)
+        assert missing == [1, 2] and np.array_equal(found[0], vectors[0]) and np.array_equal(found[3], vectors[3])
+        shrunk.store(["epsilon"], vectors[:1] * 2)  # alpha was looked up before delta, so it goes
+        found, missing = shrunk.lookup(["alpha", "delta", "epsilon"])
+        assert missing == [0] and np.array_equal(found[2], vectors[0] * 2)
+        assert shrunk.stats() == {"hits": 4, "misses": 3, "evictions": 3, "entries": 2}
+        
+        assert EmbeddingCache(cache_dir, "other-model").entries == {}
+    print("Embedding cache test passed!")
+
+def test_top_k_matches_full_sort():
+    """argpartition top_k returns exactly a stable descending sort cut to k, ties included."""
+    rng = np.random.default_rng(0)
+    for n in (1, 7, 100):
+        scores = rng.integers(0, 5, size=n).astype(np.float32)  # few distinct values, so many ties
+        expected = np.argsort(-scores, kind="stable")
+        for k in (0, 1, 3, n - 1, n, n + 5):
+            assert np.array_equal(top_k(scores, k), expected[:max(k, 0)]), (n, k)
+    assert len(top_k(np.zeros(0, dtype=np.float32), 3)) == 0
+    print("top_k test passed!")
+
+def test_vector_index_save_load_round_trip():
+    """A saved IVF int8 index searches the same after loading, with the nprobe it is loaded with."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((300, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[:5] + 0.1 * rng.standard_normal((5, 16)).astype(np.float32)
+    index = VectorIndex(mode="ivf", nlist=12, nprobe=2, quantize=True).build(vectors)
+    assert index.vectors.dtype == np.int8
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "index.npz")
+        index.save(path)
+        assert VectorIndex.load(path).nprobe == 2
+        loaded = VectorIndex.load(path, nprobe=12)
+    assert loaded.nprobe == 12 and loaded.mode == "ivf" and loaded.quantize
+    index.nprobe = 12
+    for (ids, scores), (loaded_ids, loaded_scores) in zip(index.search_batch(queries, 10),
+                                                          loaded.search_batch(queries, 10)):
+        assert np.array_equal(ids, loaded_ids) and np.array_equal(scores, loaded_scores)
+    # Probing every list scores every row, as a flat index over the same int8 codes does
+    flat = VectorIndex(quantize=True).build(vectors)
+    for (ids, scores), (flat_ids, flat_scores) in zip(loaded.search_batch(queries, 10), flat.search_batch(queries, 10)):
+        assert np.array_equal(ids, flat_ids) and np.allclose(scores, flat_scores)
+    
+    # build_index loads a persisted index with the processor's current nprobe
+    texts = [f"text number {i}" for i in range(50)]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        processor = DocumentProcessor(model=HashingModel(), workers=1, index_mode="ivf", index_nprobe=2,
+                                      index_dir=temp_dir)
+        assert processor.build_index(texts).nprobe == 2
+        processor.index_nprobe = 5
+        assert processor.build_index(texts).nprobe == 5
+        assert len(os.listdir(temp_dir)) == 1
+    print("Vector index round-trip test passed!")
+
+def test_chunk_text_windows():
+    """Chunks cover every token in order, consecutive chunks share exactly the overlap, and stalled windows are rejected."""
+    for n in (1, 8, 9, 13, 23, 24):
+        words = [f"w{i}" for i in range(n)]
+        chunks = [chunk.split() for chunk in chunk_text(" ".join(words), 8, 3)]
+        assert all(1 <= len(chunk) <= 8 for chunk in chunks)
+        for previous, chunk in zip(chunks, chunks[1:]):
+            assert previous[-3:] == chunk[:3]
+        assert chunks[0] + [word for chunk in chunks[1:] for word in chunk[3:]] == words, n
+    assert chunk_text("  short   text ", 8, 3) == ["  short   text "]
+    for overlap in (8, 9):
+        for make in (lambda: chunk_text("a b c", 8, overlap),
+                     lambda: DocumentProcessor(model=HashingModel(), chunk_tokens=8, chunk_overlap=overlap)):
+            try:
+                make()
+            except ValueError:
+                continue
+            raise AssertionError(f"overlap {overlap} of 8 tokens was accepted")
+    print("Chunking test passed!")
+
+def test_chunk_scores_aggregate_per_subsection():
+    """Chunk scores are combined per subsection by max or mean, and only chunks that were scored count."""
+    owners = np.array([0, 0, 1, 2, 2, 2])
+    chunk_scores = np.array([0.1, 0.5, 0.25, 0.2, 0.4, 0.6], dtype=np.float32)
+    processor = DocumentProcessor(model=HashingModel(), workers=1, chunk_tokens=8, chunk_overlap=2)
+    for aggregation, expected_ids, expected_scores in (("max", [2, 0, 1], [0.6, 0.5, 0.25]),
+                                                       ("mean", [2, 0, 1], [0.4, 0.3, 0.25])):
+        processor.chunk_aggregation = aggregation
+        ids, scores = processor.aggregate_chunk_hits((np.arange(6), chunk_scores), owners)
+        assert ids.tolist() == expected_ids and np.allclose(scores, expected_scores), aggregation
+    ids, scores = processor.aggregate_chunk_hits((np.array([5, 1]), chunk_scores[[5, 1]]), owners)
+    assert ids.tolist() == [2, 0] and np.allclose(scores, [0.6, 0.5])
+    
+    # Through the index: each subsection scores as its best chunk
+    processor.chunk_aggregation = "max"
+    subsections = []
+    for document in processor.extract_documents(sorted(INPUT_DIR.glob("*.pdf"))[:2]):
+        subsections.extend(document["subsections"])
+    chunks, owners = processor.chunk_subsections(subsections)
+    assert len(chunks) > len(subsections) and set(owners.tolist()) == set(range(len(subsections)))
+    query = processor.encode_texts(["vegetarian dinner menu for a corporate gathering"])
+    ids, scores = processor.search_subsections(processor.build_index(chunks), owners, query)[0]
+    chunk_scores = processor.encode_texts(chunks) @ query[0]
+    best = np.array([chunk_scores[owners == i].max() for i in range(len(subsections))])
+    expected = top_k(best, processor.top_k)
+    assert np.array_equal(ids, expected) and np.allclose(scores, best[expected])
+    print("Chunk aggregation test passed!")
+
+def test_duplicate_grouping_at_threshold():
+    """Exact copies always group; a near-duplicate groups exactly when its Jaccard similarity reaches the threshold."""
+    text = "Vegetarian dinner menu ideas for large corporate groups and buffets"
+    near = text.replace("large", "big")
+    texts = [text, near, "Packing tips for a beach holiday", text, text.upper()]
+    grouper = DuplicateGrouper(threshold=0.5)
+    similarity = grouper.jaccard(grouper.shingles(text), grouper.shingles(near))
+    assert 0.5 < similarity < 1
+    
+    representatives, group_of, exact = DuplicateGrouper(threshold=similarity).group(texts)
+    assert representatives.tolist() == [0, 2] and group_of.tolist() == [0, 0, 1, 0, 0] and exact == 1
+    representatives, group_of, exact = DuplicateGrouper(threshold=np.nextafter(similarity, 1)).group(texts)
+    assert representatives.tolist() == [0, 1, 2] and group_of.tolist() == [0, 1, 2, 0, 0] and exact == 1
+    print("Duplicate grouping test passed!")
+
+def test_duplicate_scores_fan_out_to_members():
+    """Each member of a duplicate group is ranked with its representative's score under its own document and page."""
+    title = "Vegetarian dinner menu ideas for corporate groups"
+    body = "A vegetarian buffet dinner menu for a corporate gathering, with gluten-free sides and salads. " * 3
+    sections = [{"title": title, "level": "H1", "page": 1, "document": "a.pdf"},
+                {"title": "History of the old town walls", "level": "H1", "page": 2, "document": "a.pdf"},
+                {"title": title, "level": "H1", "page": 4, "document": "b.pdf"},
+                {"title": title + ".", "level": "H1", "page": 9, "document": "c.pdf"},
+                {"title": "Packing tips for a beach holiday", "level": "H1", "page": 3, "document": "c.pdf"}]
+    subsections = [{"section": title, "text": body, "page": 1, "document": "a.pdf"},
+                   {"section": "Walls", "text": "The walls were built in the twelfth century by the counts.", "page": 2,
+                    "document": "a.pdf"},
+                   {"section": title, "text": body.replace("salads", "salad"), "page": 9, "document": "c.pdf"}]
+    persona, job = "Food Contractor", "Prepare a vegetarian buffet-style dinner menu for a corporate gathering"
+    
+    processor = DocumentProcessor(model=HashingModel(), workers=1, dedup_threshold=0.8)
+    ranked_sections, ranked_subsections = processor.calculate_relevance_scores(sections, subsections, persona, job)
+    assert [(s["document"], s["page"], s["title"]) for s in ranked_sections[:3]] == \
+        [("a.pdf", 1, title), ("b.pdf", 4, title), ("c.pdf", 9, title + ".")]
+    assert [(s["document"], s["page"]) for s in ranked_subsections[:2]] == [("a.pdf", 1), ("c.pdf", 9)]
+    assert ranked_subsections[0]["importance_rank"] == ranked_subsections[1]["importance_rank"]
+    assert ranked_subsections[1]["text"] == subsections[2]["text"]
+    counters = processor.instrumentation.counters
+    assert counters["dedup_exact_duplicates"] == 1 and counters["dedup_near_duplicates"] == 2
+    assert counters["texts_encoded"] == 1 + 3 + 2  # query, distinct titles, distinct bodies
+    print("Duplicate fan-out test passed!")
+
 if __name__ == "__main__":
     print("Running Adobe Hackathon Round 1B Solution Tests\n")
     
     try:
         test_constraints()
         test_document_processing()
+        test_prefilter_full_pool_matches_exhaustive()
+        test_manifest_reuse_keeps_document_names()
+        test_budget_scheduler_admits_and_plans()
+        test_budget_skips_and_truncates_documents()
+        test_budget_ranks_at_the_level_that_fits()
+        test_embedding_cache_reload_and_eviction()
+        test_top_k_matches_full_sort()
+        test_vector_index_save_load_round_trip()
+        test_chunk_text_windows()
+        test_chunk_scores_aggregate_per_subsection()
+        test_duplicate_grouping_at_threshold()
+        test_duplicate_scores_fan_out_to_members()
         print("\nAll tests passed! Solution is ready for deployment.")
     except Exception as e:
         print(f"\nTest suite failed: {e}")
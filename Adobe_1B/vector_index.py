@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+
+import os
+import hashlib
+from typing import List, Optional, Tuple
+import numpy as np
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, ties kept in input order.
+
+    Uses argpartition so only the candidates at or above the k-th score are
+    sorted; the result matches a stable descending sort truncated to k.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind="stable")
+    kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    candidates = np.flatnonzero(scores >= kth)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
+
+class VectorIndex:
+    """Top-k inner-product search over a fixed set of embeddings.
+
+    ``flat`` keeps the exact float32 matrix. ``ivf`` clusters the rows with
+    k-means and only scores the ``nprobe`` lists closest to the query; with
+    ``quantize`` the rows are stored as int8 codes with a per-row scale.
+    """
+
+    def __init__(self, mode: str = "flat", nlist: Optional[int] = None, nprobe: int = 8,
+                 quantize: bool = False, seed: int = 0):
+        if mode not in ("flat", "ivf"):
+            raise ValueError(f"Unknown index mode {mode}")
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = max(1, int(nprobe))
+        self.quantize = quantize
+        self.seed = seed
+
+        self.size = 0
+        self.vectors: Optional[np.ndarray] = None  # float32 rows, or int8 codes when quantized
+        self.scales: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.list_offsets: Optional[np.ndarray] = None  # CSR layout of rows grouped by list
+        self.list_rows: Optional[np.ndarray] = None
+
+    def build(self, embeddings: np.ndarray) -> "VectorIndex":
+        """Index the given rows; row i is returned as id i by search."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.size = len(embeddings)
+        if self.size == 0:
+            return self
+
+        if self.mode == "ivf":
+            nlist = self.nlist or max(1, int(np.sqrt(self.size)))
+            self.centroids, assignments = self._kmeans(embeddings, min(nlist, self.size))
+            self.list_rows = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=len(self.centroids))
+            self.list_offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        if self.quantize:
+            self.scales = np.maximum(np.abs(embeddings).max(axis=1), 1e-12) / 127.0
+            self.vectors = np.round(embeddings / self.scales[:, None]).astype(np.int8)
+            self.scales = self.scales.astype(np.float32)
+        else:
+            self.vectors = embeddings
+        return self
+
+    def _kmeans(self, data: np.ndarray, k: int, iterations: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """Inner-product k-means, returning centroids and row assignments."""
+        rng = np.random.default_rng(self.seed)
+        centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+        assignments = np.zeros(len(data), dtype=np.int64)
+        for iteration in range(iterations):
+            new_assignments = np.argmax(data @ centroids.T, axis=1)
+            if iteration and np.array_equal(new_assignments, assignments):
+                break
+            assignments = new_assignments
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, data)
+            counts = np.bincount(assignments, minlength=k)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.maximum(norms, 1e-12)
+        return centroids, assignments
+
+    def _score_rows(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if self.quantize:
+            scales = self.scales if rows is None else self.scales[rows]
+            return (vectors.astype(np.float32) @ query) * scales
+        return vectors @ query
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row ids, scores) of the k best rows for the query, best first."""
+        if self.size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+
+        if self.mode == "flat":
+            scores = self._score_rows(query)
+            ids = top_k(scores, k)
+            return ids, scores[ids]
+
+        rows, scores = self._probe(query)
+        best = top_k(scores, k)
+        return rows[best], scores[best]
+
+    def _probe(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """IVF: (rows, scores) of the nprobe lists closest to the query."""
+        probes = top_k(self.centroids @ query, self.nprobe)
+        rows = np.sort(np.concatenate([
+            self.list_rows[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes
+        ]))
+        return rows, self._score_rows(query, rows)
+
+    def search_batch(self, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """search() for each row of ``queries``; flat indexes score all of them in one matrix product."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.size == 0 or self.mode == "ivf" or len(queries) == 1:
+            return [self.search(query, k) for query in queries]
+
+        results = []
+        for column in self._score_matrix(queries):
+            ids = top_k(column, k)
+            results.append((ids, column[ids]))
+        return results
+
+    def score_batch(self, queries: np.ndarray) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Unsorted (row ids, scores) of every row each query is scored against.
+
+        That is every row for flat indexes and the probed lists for IVF; for callers
+        that reduce the scores themselves instead of taking a top-k.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.size == 0:
+            return [(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)) for _ in queries]
+        if self.mode == "ivf":
+            return [self._probe(query) for query in queries]
+        rows = np.arange(self.size)
+        if len(queries) == 1:
+            return [(rows, self._score_rows(queries[0]))]
+        return [(rows, column) for column in self._score_matrix(queries)]
+
+    def _score_matrix(self, queries: np.ndarray) -> np.ndarray:
+        """Flat: one row of scores per query, from a single matrix product."""
+        if self.quantize:
+            scores = (self.vectors.astype(np.float32) @ queries.T) * self.scales[:, None]
+        else:
+            scores = self.vectors @ queries.T
+        return np.ascontiguousarray(scores.T)
+
+    def save(self, path: str):
+        """Write the index to a single .npz file."""
+        arrays = {
+            "mode": np.array(self.mode),
+            "nprobe": np.array(self.nprobe),
+            "quantize": np.array(self.quantize),
+            "size": np.array(self.size)
+        }
+        for name in ("vectors", "scales", "centroids", "list_offsets", "list_rows"):
+            value = getattr(self, name)
+            if value is not None:
+                arrays[name] = value
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, nprobe: Optional[int] = None) -> "VectorIndex":
+        """Read an index written by save(); ``nprobe`` is a search setting, so it overrides the saved one."""
+        with np.load(path) as data:
+            nprobe = int(data["nprobe"]) if nprobe is None else nprobe
+            index = cls(mode=str(data["mode"]), nprobe=nprobe, quantize=bool(data["quantize"]))
+            index.size = int(data["size"])
+            for name in ("vectors", "scales", "centroids", "list_offsets", "list_rows"):
+                if name in data:
+                    setattr(index, name, data[name])
+        return index
+
+
+def collection_key(model_name: str, texts: List[str], *options) -> str:
+    """Fingerprint of a text collection plus the options its index was built with."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (model_name, *map(str, options)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for the 1B span heading heuristic.
+
+Collects every non-empty span from the bundled PDFs, then times the original
+per-span loop (four re.match calls) against HeadingClassifier.
+
+    python benchmarks/bench_headings.py [--input Adobe_1B/input] [--repeat 20]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "Adobe_1B"))
+
+import fitz  # PyMuPDF
+from main import DocumentExtractor, HeadingClassifier
+
+
+def collect_spans(input_dir):
+    spans = []
+    for pdf_path in sorted(Path(input_dir).glob("*.pdf")):
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                for block in page.get_text("dict")["blocks"]:
+                    for line in block.get("lines", []):
+                        for span in line["spans"]:
+                            text = span["text"].strip()
+                            if text:
+                                spans.append((text, span["size"], span["flags"] & 2**4))
+    return spans
+
+
+def legacy_is_heading(patterns, text, font_size, is_bold):
+    # The heuristic as it was inlined in extract_text_from_pdf
+    return (
+        font_size > 12 or
+        is_bold or
+        any(re.match(pattern, text) for pattern in patterns) or
+        len(text.split()) <= 8 and text.isupper()
+    )
+
+
+def spans_per_second(fn, spans, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text, size, bold in spans:
+            fn(text, size, bold)
+    return len(spans) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--input", default=str(ROOT / "Adobe_1B" / "input"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    spans = collect_spans(args.input)
+    if not spans:
+        sys.exit(f"No spans found in {args.input}")
+    patterns = DocumentExtractor().section_patterns
+    classifier = HeadingClassifier(patterns)
+
+    mismatches = sum(
+        bool(legacy_is_heading(patterns, *span)) != classifier.is_heading(*span) for span in spans
+    )
+    before = spans_per_second(lambda *span: legacy_is_heading(patterns, *span), spans, args.repeat)
+    after = spans_per_second(classifier.is_heading, spans, args.repeat)
+
+    print(f"{len(spans)} spans from {os.path.abspath(args.input)}, {args.repeat} repeats")
+    print(f"before (re.match per pattern): {before:,.0f} spans/s")
+    print(f"after  (HeadingClassifier):    {after:,.0f} spans/s  ({after / before:.2f}x)")
+    print(f"mismatched decisions: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Benchmark suite for the 1A outline extractor and the 1B ranker.
+
+Generates synthetic PDF corpora of controlled size, runs each pipeline stage
+at several scales in a fresh process, and writes wall time, pages/s, peak RSS
+and embeddings/s to a JSON file that can be compared across commits.
+
+    python benchmarks/run_benchmarks.py                      # default scales
+    python benchmarks/run_benchmarks.py --pages 10 200 --spans 40
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/abc1234.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "Adobe_1A"))
+sys.path.insert(0, str(ROOT / "Adobe_1B"))
+
+import fitz  # PyMuPDF
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+WORDS = ("analysis data method result model process system report value design market "
+         "energy budget policy review sample growth recipe menu travel guide section table "
+         "figure summary revenue student reaction kinetics onboarding compliance form").split()
+
+STAGES = ("extract_outline", "extract_blocks", "extract_text_from_pdf", "calculate_relevance_scores")
+
+
+def make_pdf(path, pages, spans_per_page, fonts=3, toc=False, seed=0):
+    """Write a synthetic PDF with `fonts` heading sizes above 10pt body text."""
+    rng = random.Random(seed)
+    heading_sizes = [24 - 4 * level for level in range(fonts)]
+    doc = fitz.open()
+    outline = []
+    for pno in range(pages):
+        page = doc.new_page(width=612, height=792)
+        y = 60
+        for i in range(spans_per_page):
+            if i % 8 == 0:
+                level = (i // 8) % fonts
+                text = f"{i // 8 + 1}. " + " ".join(rng.choice(WORDS).title() for _ in range(3))
+                page.insert_text((72, y), text, fontsize=heading_sizes[level], fontname="hebo")
+                outline.append([level + 1, text, pno + 1])
+                y += heading_sizes[level] + 8
+            else:
+                text = " ".join(rng.choice(WORDS) for _ in range(10))
+                page.insert_text((72, y), text, fontsize=10, fontname="helv")
+                y += 14
+            if y > 740:
+                break
+    if toc:
+        # A TOC must start at level 1 and only step down one level at a time
+        outline = [entry for entry in outline if entry[0] == 1]
+        doc.set_toc(outline)
+    doc.save(path)
+    doc.close()
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(stage, pdf_path, pages, page_workers=1):
+    """Run one stage on one PDF; executed in a fresh process so peak RSS is per case."""
+    result = {"stage": stage}
+    if stage in ("extract_outline", "extract_blocks"):
+        import process_pdf
+        fn = process_pdf.extract_outline if stage == "extract_outline" else process_pdf.extract_blocks
+        start = time.perf_counter()
+        out = fn(pdf_path, page_workers=page_workers)
+        result["wall_seconds"] = time.perf_counter() - start
+        result["items"] = len(out["outline"]) if stage == "extract_outline" else len(out["size"])
+    elif stage == "extract_text_from_pdf":
+        from main import DocumentExtractor
+        extractor = DocumentExtractor(page_workers=page_workers)
+        start = time.perf_counter()
+        pages_data = extractor.extract_text_from_pdf(pdf_path)
+        result["wall_seconds"] = time.perf_counter() - start
+        result["items"] = sum(len(page["sections"]) for page in pages_data)
+    else:
+        from main import DocumentProcessor
+        processor = DocumentProcessor(workers=1)
+        try:
+            processor.warm_up()
+        except Exception as e:
+            return {"stage": stage, "skipped": f"model unavailable: {e}".splitlines()[0]}
+        parsed = processor.process_document(pdf_path)
+        texts = len(parsed["sections"]) + len(parsed["subsections"]) + 1
+        start = time.perf_counter()
+        processor.calculate_relevance_scores(parsed["sections"], parsed["subsections"],
+                                             "Research Analyst", "Summarize key findings")
+        result["wall_seconds"] = time.perf_counter() - start
+        result["items"] = texts
+        result["embeddings_per_second"] = texts / result["wall_seconds"] if result["wall_seconds"] else None
+    result["pages_per_second"] = pages / result["wall_seconds"] if result["wall_seconds"] else None
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    key = lambda r: (r["stage"], r["pages"], r["spans_per_page"], r["fonts"], r["toc"])
+    old = {key(r): r for r in baseline["results"] if "wall_seconds" in r}
+    print(f"\nCompared with {baseline.get('commit')} ({baseline_path}):")
+    for r in current["results"]:
+        before = old.get(key(r))
+        if before and "wall_seconds" in r:
+            print(f"  {r['stage']:<28} {r['pages']:>5}p toc={r['toc']!s:<5} "
+                  f"{before['wall_seconds']:.3f}s -> {r['wall_seconds']:.3f}s "
+                  f"({before['wall_seconds'] / r['wall_seconds']:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--spans", type=int, default=40, help="spans per page")
+    parser.add_argument("--fonts", type=int, default=3, help="distinct heading sizes")
+    parser.add_argument("--page-workers", type=int, default=1,
+                        help="processes parsing page ranges of one PDF (extraction stages)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--output", help="results JSON (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output_path = args.output or str(ROOT / "benchmarks" / "results" / f"{commit}.json")
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pymupdf": getattr(fitz, "VersionBind", None),
+        "results": []
+    }
+
+    spawn = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        for pages in args.pages:
+            for toc in (False, True):
+                pdf_path = os.path.join(corpus_dir, f"synthetic_{pages}p_{'toc' if toc else 'notoc'}.pdf")
+                make_pdf(pdf_path, pages, args.spans, args.fonts, toc)
+                for stage in args.stages:
+                    # Only the outline extractor reads the TOC
+                    if toc and stage != "extract_outline":
+                        continue
+                    with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                        result = executor.submit(run_case, stage, pdf_path, pages, args.page_workers).result()
+                    result.update(pages=pages, spans_per_page=args.spans, fonts=args.fonts, toc=toc,
+                                  page_workers=args.page_workers)
+                    report["results"].append(result)
+                    if "skipped" in result:
+                        print(f"{stage:<28} {pages:>5}p  skipped: {result['skipped']}")
+                    else:
+                        extra = (f", {result['embeddings_per_second']:.0f} emb/s"
+                                 if result.get("embeddings_per_second") else "")
+                        print(f"{stage:<28} {pages:>5}p toc={toc!s:<5} {result['wall_seconds']:.3f}s, "
+                              f"{result['pages_per_second']:.1f} pages/s, "
+                              f"peak RSS {result['peak_rss_mb']} MB{extra}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output_path}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
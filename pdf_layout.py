@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""PDF layout extraction shared by the 1A outline extractor and the 1B section ranker.
+
+Each page is read once with PyMuPDF's get_text("dict") into a PageLayout: one row per
+span (raw text, font size, font flags, bbox and the text block it belongs to) plus the
+bbox of each text block. 1A reduces the spans to block rows, 1B to heading and body
+spans. A LayoutStore keeps the layout of each PDF on disk, keyed by content hash, so
+pipelines pointed at the same store directory parse every PDF once between them.
+Large PDFs can be parsed by several processes at once, each reading a range of pages.
+"""
+
+import os
+import json
+import mmap
+import shutil
+import math
+import time
+import hashlib
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+import fitz  # PyMuPDF
+import logging
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_VERSION = 2  # bump when the extracted spans or the stored columns change
+PROBE_PAGES = 8  # parsed in-process first; their timing decides whether to split the rest
+SPLIT_OVERHEAD_SECONDS = 0.2  # starting the worker processes and opening the PDF in each
+RANGE_PAGES = 16  # smallest page range handed to a worker
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PageLayout:
+    """Spans of one page, as columns.
+
+    ``texts`` are the raw span texts (not stripped, empty spans included); ``blocks``
+    gives each span's text block as an index into ``block_bboxes``. Spans are in
+    reading order, so the spans of a block are contiguous.
+    """
+
+    __slots__ = ("texts", "sizes", "flags", "bboxes", "blocks", "block_bboxes")
+
+    def __init__(self, texts: List[str], sizes: np.ndarray, flags: np.ndarray, bboxes: np.ndarray,
+                 blocks: np.ndarray, block_bboxes: np.ndarray):
+        self.texts = texts
+        self.sizes = sizes
+        self.flags = flags
+        self.bboxes = bboxes.reshape(-1, 4)
+        self.blocks = blocks
+        self.block_bboxes = block_bboxes.reshape(-1, 4)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+def parse_page(page, flags: Optional[int] = None) -> PageLayout:
+    """Layout of one fitz page; ``flags`` are passed through to get_text("dict")."""
+    texts = []
+    sizes, span_flags, bboxes = array("d"), array("i"), array("d")
+    blocks, block_bboxes = array("i"), array("d")
+    for block in page.get_text("dict", flags=flags)["blocks"]:
+        spans = [span for line in block.get("lines", ()) for span in line["spans"]]
+        if not spans:
+            continue  # image block
+        block_id = len(block_bboxes) // 4
+        block_bboxes.extend(block["bbox"])
+        for span in spans:
+            texts.append(span["text"])
+            sizes.append(span["size"])
+            span_flags.append(span["flags"])
+            bboxes.extend(span["bbox"])
+            blocks.append(block_id)
+    return PageLayout(texts, np.asarray(sizes), np.asarray(span_flags), np.asarray(bboxes),
+                      np.asarray(blocks), np.asarray(block_bboxes))
+
+
+def iter_layout(doc, flags: Optional[int] = None) -> Iterator[PageLayout]:
+    """Parse the pages of an open document one at a time."""
+    for page in doc:
+        yield parse_page(page, flags)
+
+
+def parse_range(pdf_path: str, start: int, stop: int, flags: Optional[int] = None) -> List[PageLayout]:
+    """Layouts of pages [start, stop), read through a fitz handle of this process's own."""
+    with fitz.open(pdf_path) as doc:
+        return [parse_page(doc.load_page(page_num), flags) for page_num in range(start, stop)]
+
+
+def split_threshold(seconds_per_page: float, workers: int,
+                    overhead: float = SPLIT_OVERHEAD_SECONDS) -> float:
+    """Fewest pages for which parsing across ``workers`` processes beats parsing in one.
+
+    Serially n pages take n * c; split they take about overhead + n * c / workers.
+    """
+    if workers <= 1 or seconds_per_page <= 0:
+        return math.inf
+    return overhead / (seconds_per_page * (1 - 1 / workers))
+
+
+def toc_entries(doc) -> List[List[Any]]:
+    """The document outline as [level, title, page] rows (1-based pages, as PyMuPDF reports them)."""
+    return [list(entry[:3]) for entry in doc.get_toc(simple=False)]
+
+
+class ParsedLayout:
+    """Layout read from the PDF itself, a page at a time.
+
+    With a writer, parsed pages are also appended to a store entry. Leaving the ``with``
+    block parses any pages the caller did not read and commits the entry, so stored
+    layouts are always complete; an exception discards it instead.
+
+    With ``workers`` > 1 the first PROBE_PAGES pages are parsed here and timed; if the
+    remaining pages reach ``split_pages`` (default: split_threshold of the measured
+    rate), they are split into ranges parsed by a process pool and yielded in page order.
+    """
+
+    stored = False
+
+    def __init__(self, pdf_path: str, flags: Optional[int] = None, workers: int = 1,
+                 split_pages: Optional[int] = None):
+        self.doc = fitz.open(pdf_path)
+        self.pdf_path = pdf_path
+        self.flags = flags
+        self.workers = workers
+        self.split_pages = split_pages
+        self.writer: Optional[LayoutWriter] = None
+        self.page_count = self.doc.page_count
+        self.toc = toc_entries(self.doc)
+        self.parse_seconds = 0.0
+        self.split = False
+        self._parsed = 0
+
+    def pages(self) -> Iterator[PageLayout]:
+        while self._parsed < self.page_count:
+            if self.split or (self.workers > 1 and self._parsed == min(PROBE_PAGES, self.page_count)
+                              and self._should_split()):
+                yield from self._split_pages()
+                return
+            start = time.perf_counter()
+            layout = parse_page(self.doc.load_page(self._parsed), self.flags)
+            self.parse_seconds += time.perf_counter() - start
+            yield self._add(layout)
+
+    def _add(self, layout: PageLayout) -> PageLayout:
+        self._parsed += 1
+        if self.writer is not None:
+            self.writer.add_page(layout)
+        return layout
+
+    def _should_split(self) -> bool:
+        remaining = self.page_count - self._parsed
+        threshold = self.split_pages
+        if threshold is None:
+            # Processes beyond the CPU count add overhead but no parallelism
+            threshold = split_threshold(self.parse_seconds / self._parsed, min(self.workers, os.cpu_count() or 1))
+        self.split = remaining >= threshold
+        if self.split:
+            logger.info(f"Parsing {remaining} pages of {self.pdf_path} in {self.workers} processes")
+        return self.split
+
+    def _split_pages(self) -> Iterator[PageLayout]:
+        remaining = self.page_count - self._parsed
+        # Several ranges per worker balance uneven pages; at most two per worker are in flight
+        size = max(RANGE_PAGES, math.ceil(remaining / (4 * self.workers)))
+        ranges = deque((start, min(start + size, self.page_count))
+                       for start in range(self._parsed, self.page_count, size))
+        pool = ProcessPoolExecutor(min(self.workers, len(ranges)))
+        pending = deque()
+
+        def submit():
+            if ranges:
+                start, stop = ranges.popleft()
+                pending.append(pool.submit(parse_range, self.pdf_path, start, stop, self.flags))
+
+        try:
+            for _ in range(2 * self.workers):
+                submit()
+            while pending:
+                layouts = pending.popleft().result()
+                submit()
+                for layout in layouts:
+                    yield self._add(layout)
+        finally:
+            # A caller that stops early (e.g. at a deadline) only waits for ranges already running
+            pool.shutdown(cancel_futures=True)
+
+    def __enter__(self) -> "ParsedLayout":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.writer is not None:
+                if exc_type is None:
+                    for _ in self.pages():
+                        pass
+                    self.writer.commit(self.page_count, self.toc)
+                else:
+                    self.writer.abort()
+        finally:
+            self.doc.close()
+
+
+class StoredLayout:
+    """Layout of one PDF read back from a LayoutStore entry.
+
+    Numeric columns are ``np.load(mmap_mode="r")`` views and span texts are decoded from
+    the mapped UTF-8 buffer a page at a time, so opening an entry costs no parsing.
+    """
+
+    stored = True
+
+    def __init__(self, entry: str, meta: Dict[str, Any]):
+        self.entry = entry
+        self.page_count = meta["pages"]
+        self.toc = meta["toc"]
+        self.page_offsets = self._column("page_offsets")
+        self.block_offsets = self._column("block_offsets")
+        self.buffer = None
+        if meta["spans"]:
+            self.offsets = self._column("offsets")
+            self.sizes = self._column("sizes")
+            self.flags = self._column("flags")
+            self.bboxes = self._column("bboxes")
+            self.blocks = self._column("blocks")
+            self.block_bboxes = self._column("block_bboxes")
+            self.buffer = b""  # mmap refuses empty files, e.g. pages of whitespace-only spans
+            if self.offsets[-1]:
+                with open(os.path.join(entry, "text.bin"), "rb") as f:
+                    self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _column(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.entry, f"{name}.npy"), mmap_mode="r")
+
+    def page(self, page_num: int) -> PageLayout:
+        """Layout of one page (0-based)."""
+        start, end = int(self.page_offsets[page_num]), int(self.page_offsets[page_num + 1])
+        if start == end:
+            return PageLayout([], np.zeros(0), np.zeros(0, dtype=np.int32), np.zeros(0),
+                              np.zeros(0, dtype=np.int32), np.zeros(0))
+        offsets = self.offsets[start:end + 1].tolist()
+        texts = [self.buffer[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+        block_start, block_end = int(self.block_offsets[page_num]), int(self.block_offsets[page_num + 1])
+        return PageLayout(texts, self.sizes[start:end], self.flags[start:end], self.bboxes[start:end],
+                          self.blocks[start:end], self.block_bboxes[block_start:block_end])
+
+    def pages(self) -> Iterator[PageLayout]:
+        for page_num in range(self.page_count):
+            yield self.page(page_num)
+
+    def __enter__(self) -> "StoredLayout":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+
+class LayoutWriter:
+    """Appends pages to a new store entry; span text is streamed to disk as pages arrive."""
+
+    def __init__(self, entry: str):
+        self.entry = entry
+        self.tmp = f"{entry}.tmp{os.getpid()}"
+        os.makedirs(self.tmp, exist_ok=True)
+        self.text_file = open(os.path.join(self.tmp, "text.bin"), "wb")
+        self.offsets = array("q", [0])
+        self.page_offsets = array("q", [0])
+        self.block_offsets = array("q", [0])
+        self.sizes = array("d")
+        self.flags = array("i")
+        self.bboxes = array("d")
+        self.blocks = array("i")
+        self.block_bboxes = array("d")
+
+    def add_page(self, layout: PageLayout):
+        for text in layout.texts:
+            encoded = text.encode("utf-8")
+            self.text_file.write(encoded)
+            self.offsets.append(self.offsets[-1] + len(encoded))
+        self.sizes.extend(layout.sizes.tolist())
+        self.flags.extend(layout.flags.tolist())
+        self.bboxes.extend(layout.bboxes.ravel().tolist())
+        self.blocks.extend(layout.blocks.tolist())
+        self.block_bboxes.extend(layout.block_bboxes.ravel().tolist())
+        self.page_offsets.append(len(self.sizes))
+        self.block_offsets.append(len(self.block_bboxes) // 4)
+
+    def commit(self, page_count: int, toc: List[List[Any]]):
+        """Write the columns and move the entry into place."""
+        self.text_file.close()
+        columns = {
+            "offsets": np.asarray(self.offsets, dtype=np.int64),
+            "page_offsets": np.asarray(self.page_offsets, dtype=np.int64),
+            "block_offsets": np.asarray(self.block_offsets, dtype=np.int64),
+            "sizes": np.asarray(self.sizes, dtype=np.float64),
+            "flags": np.asarray(self.flags, dtype=np.int32),
+            "bboxes": np.asarray(self.bboxes, dtype=np.float64).reshape(-1, 4),
+            "blocks": np.asarray(self.blocks, dtype=np.int32),
+            "block_bboxes": np.asarray(self.block_bboxes, dtype=np.float64).reshape(-1, 4),
+        }
+        for name, values in columns.items():
+            np.save(os.path.join(self.tmp, f"{name}.npy"), values)
+        meta = {"version": LAYOUT_VERSION, "pages": page_count, "spans": len(self.sizes), "toc": toc}
+        with open(os.path.join(self.tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        try:
+            os.replace(self.tmp, self.entry)
+        except OSError:
+            # Another worker stored the same content first
+            shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def abort(self):
+        self.text_file.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class LayoutStore:
+    """On-disk columnar store of PDF layouts, one entry per content hash.
+
+    Each entry holds ``text.bin`` (span texts back to back as UTF-8), ``offsets.npy``
+    (byte offsets into it), ``page_offsets.npy``/``block_offsets.npy`` (first span and
+    first block of each page), fixed-width ``sizes``/``flags``/``bboxes``/``blocks`` span
+    arrays, ``block_bboxes.npy`` and ``meta.json`` (page count and TOC). Raw spans are
+    stored rather than headings, so either pipeline's heuristics can change without
+    re-parsing.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        os.makedirs(store_dir, exist_ok=True)
+
+    def entry_path(self, pdf_path: str, variant: str = "") -> str:
+        """Entry of a PDF; ``variant`` separates layouts parsed with non-default get_text flags."""
+        name = file_digest(pdf_path)
+        return os.path.join(self.store_dir, f"{name}-{variant}" if variant else name)
+
+    def open(self, entry: str) -> Optional[StoredLayout]:
+        """The stored layout at ``entry``, or None if it has not been written (or is stale)."""
+        try:
+            with open(os.path.join(entry, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != LAYOUT_VERSION:
+            shutil.rmtree(entry, ignore_errors=True)  # rewritten on the next parse
+            return None
+        try:
+            return StoredLayout(entry, meta)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable layout entry {entry}: {e}")
+            return None
+
+    def writer(self, entry: str) -> LayoutWriter:
+        return LayoutWriter(entry)
+
+
+def open_layout(pdf_path: str, store: Optional[LayoutStore] = None, flags: Optional[int] = None,
+                variant: str = "", workers: int = 1, split_pages: Optional[int] = None):
+    """Layout of a PDF: from ``store`` when it has the entry, else parsed (and stored).
+
+    Use as a context manager; both kinds expose ``page_count``, ``toc``, ``stored`` and
+    ``pages()``. ``workers`` and ``split_pages`` control page-range parallelism when
+    the PDF is parsed (see ParsedLayout).
+    """
+    if store is None:
+        return ParsedLayout(pdf_path, flags, workers, split_pages)
+    entry = store.entry_path(pdf_path, variant)
+    stored = store.open(entry)
+    if stored is not None:
+        return stored
+    layout = ParsedLayout(pdf_path, flags, workers, split_pages)
+    layout.writer = store.writer(entry)  # only once the PDF has opened, so bad files leave no temp entry
+    return layout